@@ -0,0 +1,70 @@
+"""Compare `TextAlignment` with slicing through the `chars` iterator.
+
+Run with ``python benchmarks/bench_alignment.py``. Both approaches cut a
+100 KB annotated text into the same word-sized spans.
+"""
+
+import itertools
+import time
+import tracemalloc
+from collections.abc import Callable
+
+from xmlparser.xmlparser import TextAlignment, chars, remove_tags
+
+
+def annotated_text(size: int = 100_000) -> str:
+    words = itertools.cycle(
+        ['<span typeof="d3o:Gene">lacZ</span>', "was", "expressed", "in"]
+    )
+    parts: list[str] = []
+    while sum(map(len, parts)) < size:
+        parts.append(next(words))
+    return " ".join(parts)
+
+
+def with_chars(text: str, lengths: list[int]) -> list[str]:
+    units = chars(text)
+    return ["".join(itertools.islice(units, n)) for n in lengths]
+
+
+def with_alignment(text: str, lengths: list[int]) -> list[str]:
+    alignment = TextAlignment(text)
+    spans = []
+    offset = 0
+    for n in lengths:
+        spans.append(alignment.span(offset, offset + n))
+        offset += n
+    return spans
+
+
+def measure(
+    func: Callable[[str, list[int]], list[str]], text: str, lengths: list[int]
+) -> tuple[float, int]:
+    start = time.perf_counter()
+    func(text, lengths)
+    elapsed = time.perf_counter() - start
+
+    # Tracing slows the functions down, so memory is measured separately.
+    tracemalloc.start()
+    func(text, lengths)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    text = annotated_text()
+    lengths = [len(word) + 1 for word in remove_tags(text).split(" ")]
+
+    assert with_chars(text, lengths) == with_alignment(text, lengths)
+
+    for func in (with_chars, with_alignment):
+        elapsed, peak = measure(func, text, lengths)
+        print(
+            f"{func.__name__:>15}  {elapsed * 1000:8.2f} ms  "
+            f"peak {peak / 1024:8.1f} KiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
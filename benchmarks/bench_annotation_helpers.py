@@ -0,0 +1,120 @@
+"""Micro-benchmarks for the helpers of the annotation loop.
+
+Run with ``python benchmarks/bench_annotation_helpers.py``. Each helper is
+timed on the kind of input `reinsert_tags` feeds it, next to the way it used
+to build its regular expression on every call.
+"""
+
+import re
+import timeit
+from collections.abc import Callable, Iterator
+
+from lxml.etree import Element
+
+from xmlparser.xmlparser import (
+    attribs,
+    chars,
+    closed_tag,
+    curies,
+    markup_regex,
+    open_tag,
+    parse_attribs,
+    tag_pattern,
+)
+
+NUMBER = 20_000
+
+SPAN = '<span typeof="d3o:Strain" resource="#T3">'
+DIV = (
+    '<div class="chunk-body" prefix="d3o: https://purl.dsmz.de/schema/ '
+    'schema: http://schema.org/">'
+)
+SEGMENT = f"with the {SPAN}indole</span> precursor {SPAN}l-tryptophan</span>"
+
+
+def attribs_before(string: str) -> dict[str, str]:
+    invalid_chars = r"\"'<>=\x00-\x1f\x7f-\x9f"
+    attribute = rf"([^ {invalid_chars}]+)"
+    value = rf"[\"\']([^{invalid_chars}]+)[\"\']"
+    return dict(re.findall(rf"{attribute}={value}", string))
+
+
+def curies_before(elem: Element) -> set[str]:
+    prefix = r"[a-zA-Z_][a-zA-Z_\-\.\d]*"
+    uri = (
+        r"[^:/?#]+:"
+        r"(?://[^/?# ]+)?"
+        r"[^?# ]*"
+        r"(?:\?(?:[^# ]*))?"
+        r"(?:#(?:\S*))?"
+    )
+    curie = re.compile(rf"({prefix}: ?{uri})")
+    return set(re.findall(curie, elem.attrib.get("prefix", "")))
+
+
+def split_before(text: str) -> list[str]:
+    return re.findall(rf"{tag_pattern}|[^<>]+", text)
+
+
+def chars_before(text: str) -> Iterator[str]:
+    tag_char = rf"({open_tag})|({closed_tag})|(.)"
+    current: list[str] = []
+
+    for split in re.findall(tag_char, text):
+        last_aint_tag = (
+            bool(current) and re.match(tag_pattern, current[-1]) is None
+        )
+        match split:
+            case ("", s, ""):
+                current.append(s)
+                if last_aint_tag:
+                    yield "".join(current)
+                    current = []
+            case (s, "", "") | ("", "", s):
+                if last_aint_tag:
+                    yield "".join(current)
+                    current = []
+                current.append(s)
+
+    if current:
+        yield "".join(current)
+
+
+def main() -> None:
+    div = Element("div", attribs(DIV))
+
+    def attribs_uncached() -> dict[str, str]:
+        parse_attribs.cache_clear()
+        return attribs(SPAN)
+
+    cases: dict[str, tuple[Callable[[], object], Callable[[], object]]] = {
+        "attribs (cached)": (
+            lambda: attribs_before(SPAN),
+            lambda: attribs(SPAN),
+        ),
+        "attribs (cache miss)": (
+            lambda: attribs_before(SPAN),
+            attribs_uncached,
+        ),
+        "curies": (lambda: curies_before(div), lambda: curies(div)),
+        "split annotated text": (
+            lambda: split_before(SEGMENT),
+            lambda: markup_regex.findall(SEGMENT),
+        ),
+        "chars": (
+            lambda: list(chars_before(SEGMENT)),
+            lambda: list(chars(SEGMENT)),
+        ),
+    }
+
+    print(f"{'helper':<22} {'before':>10} {'after':>10}   (us per call)")
+    for name, (before, after) in cases.items():
+        times = [
+            min(timeit.repeat(func, number=NUMBER, repeat=3)) / NUMBER * 1e6
+            for func in (before, after)
+        ]
+        print(f"{name:<22} {times[0]:10.2f} {times[1]:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
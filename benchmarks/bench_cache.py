@@ -0,0 +1,36 @@
+"""Benchmark the article cache.
+
+Run with ``python benchmarks/bench_cache.py``. A set of articles is chunked
+through an empty cache, then again once every article is cached.
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+from corpus import article
+from xmlparser.cache import ArticleCache
+
+ARTICLES = 50
+
+
+def main() -> None:
+    articles = [
+        article(100, density=0.2, seed=seed) for seed in range(ARTICLES)
+    ]
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ArticleCache(Path(directory) / "cache.sqlite")
+        for label in ("miss", "hit"):
+            start = time.perf_counter()
+            for source in articles:
+                cache.chunks(source)
+            elapsed = time.perf_counter() - start
+            print(f"{label:<5} {elapsed / ARTICLES * 1e3:8.2f} ms per article")
+
+        print(f"{len(cache)} entries, {cache.size() / 2**20:.2f} MiB")
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
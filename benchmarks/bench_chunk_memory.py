@@ -0,0 +1,57 @@
+"""Benchmark the memory held by chunks.
+
+Run with ``python benchmarks/bench_chunk_memory.py``. The chunks of a set of
+articles are kept as dicts, as slotted `TextChunk` objects, and in a
+`ChunkBatch`, and the Python allocations of each are reported. The dicts and
+the dataclasses share the content strings, while the batch copies them into
+its buffer, so the size of the text is subtracted from the latter.
+"""
+
+import tracemalloc
+from io import BytesIO
+
+from lxml.etree import parse
+
+from corpus import article
+from xmlparser.xmlparser import ChunkBatch, TextChunk, get_chunks
+
+ARTICLES = 50
+
+
+def allocated(func):
+    tracemalloc.start()
+    result = func()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def main() -> None:
+    chunks = [
+        chunk
+        for seed in range(ARTICLES)
+        for chunk in get_chunks(
+            parse(BytesIO(article(100, density=0.2, seed=seed))),
+            minlen=300,
+            maxlen=600,
+        )
+    ]
+    rows = [(chunk.content, chunk.pos) for chunk in chunks]
+    text = sum(len(content.encode()) for content, _ in rows)
+    cases = {
+        "dict": (lambda: [{"content": c, "pos": p} for c, p in rows], 0),
+        "TextChunk": (lambda: [TextChunk(c, p) for c, p in rows], 0),
+        "ChunkBatch": (
+            lambda: ChunkBatch(TextChunk(c, p) for c, p in rows),
+            text,
+        ),
+    }
+
+    print(f"{len(rows)} chunks, {text / 2**20:.2f} MiB of text")
+    for name, (func, copied) in cases.items():
+        _, size = allocated(func)
+        print(f"{name:<12} {(size - copied) / 2**10:10.1f} KiB overhead")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Benchmark for packing segments into chunks.
+
+Run with ``python benchmarks/bench_chunks.py``. A single chunk holding the
+whole body of a synthetic article is built, so the time per segment should
+stay roughly flat as the article grows.
+"""
+
+import sys
+import time
+
+from lxml.etree import fromstring
+
+from xmlparser.xmlparser import get_chunks
+
+SIZES = (100, 1_000, 10_000)
+
+PARAGRAPH = (
+    "<p>The <italic>lacZ</italic> gene of "
+    "<named-content>E. coli</named-content> was expressed under the control"
+    " of the <sc>tac</sc> promoter.</p>"
+)
+
+
+def article(paragraphs: int) -> bytes:
+    return (
+        '<article><div class="abstract"><p>Abstract.</p></div>'
+        f'<div class="article-body">{PARAGRAPH * paragraphs}</div></article>'
+    ).encode()
+
+
+def main(sizes: tuple[int, ...] = SIZES) -> None:
+    for paragraphs in sizes:
+        source = article(paragraphs)
+        for pretty_print in (True, False):
+            tree = fromstring(source).getroottree()
+
+            start = time.perf_counter()
+            chunks = list(
+                get_chunks(
+                    tree, minlen=2**40, maxlen=2**40, pretty_print=pretty_print
+                )
+            )
+            elapsed = time.perf_counter() - start
+
+            assert len(chunks) == 2
+            print(
+                f"{paragraphs:>8} segments  "
+                f"pretty_print={pretty_print!s:<5}  {elapsed:8.3f} s  "
+                f"{elapsed / paragraphs * 1e6:6.2f} us/segment"
+            )
+
+
+if __name__ == "__main__":
+    main(tuple(int(k) for k in sys.argv[1:]) or SIZES)
@@ -0,0 +1,59 @@
+"""Benchmark for stripping namespaces from article-sized trees.
+
+Run with ``python benchmarks/bench_clean_namespaces.py``. A tree with every
+element in a namespace is cleaned once, then cleaned again, which is what
+`segment_to_string` does with the output of the cached XSLT step. Both are
+compared with visiting every element through `QName`, as before.
+"""
+
+import sys
+import time
+
+from lxml.etree import QName, _Element, cleanup_namespaces, fromstring
+
+from xmlparser.xmlparser import clean_namespaces
+
+SIZES = (1_000, 10_000, 100_000)
+
+
+def article(n: int) -> bytes:
+    paragraph = (
+        "<p>Text with <italic>markup</italic>, a "
+        '<xref xlink:href="#R1">citation</xref><!-- note --></p>'
+    )
+    return (
+        '<article xmlns="urn:jats" xmlns:mml="urn:mml" '
+        f'xmlns:xlink="urn:xlink"><body>{paragraph * n}</body></article>'
+    ).encode()
+
+
+def clean_before(elem: _Element) -> _Element:
+    for subelem in elem.iter():
+        if isinstance(subelem.tag, str):
+            subelem.tag = QName(subelem).localname
+    cleanup_namespaces(elem)
+    return elem
+
+
+def timed(func, elem: _Element) -> float:
+    start = time.perf_counter()
+    func(elem)
+    return time.perf_counter() - start
+
+
+def main(sizes: tuple[int, ...] = SIZES) -> None:
+    print(f"{'paragraphs':>10} {'before':>9} {'first':>9} {'again':>9}   (ms)")
+    for n in sizes:
+        source = article(n)
+        before = timed(clean_before, fromstring(source))
+        elem = fromstring(source)
+        first = timed(clean_namespaces, elem)
+        again = timed(clean_namespaces, elem)
+        print(
+            f"{n:>10} {before * 1e3:9.2f} {first * 1e3:9.2f} "
+            f"{again * 1e3:9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main(tuple(int(n) for n in sys.argv[1:]) or SIZES)
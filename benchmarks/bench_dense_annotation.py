@@ -0,0 +1,59 @@
+"""Benchmark `reinsert_tags` on a densely annotated chunk.
+
+Run with ``python benchmarks/bench_dense_annotation.py``. Nearly every word
+is an entity, and many entities cross inline elements or nest inside each
+other.
+"""
+
+import time
+
+from xmlparser.xmlparser import remove_tags, reinsert_tags
+
+WORDS = 4_000
+
+
+def dense_chunk(words: int = WORDS) -> tuple[str, str]:
+    """Return a chunk and its annotated text."""
+    xml: list[str] = []
+    annotated: list[str] = []
+    for i in range(words):
+        match i % 4:
+            case 0:
+                xml.append(f"<italic>E. coli</italic> K{i}")
+                annotated.append(
+                    '<span typeof="d3o:Strain"><span typeof="d3o:Organism">'
+                    f"E. coli</span> K{i}</span>"
+                )
+            case 1:
+                xml.append(f"CO<sub>2</sub>{i}")
+                annotated.append(f'<span typeof="d3o:Compound">CO2{i}</span>')
+            case 2:
+                xml.append(f"<bold>lac{i}</bold>")
+                annotated.append(f'<span typeof="d3o:Gene">lac{i}</span>')
+            case 3:
+                xml.append("and")
+                annotated.append("and")
+
+    chunk = f"<chunk-body><p>{' '.join(xml)}</p></chunk-body>"
+    text = " ".join(annotated)
+    assert remove_tags(text) == remove_tags(chunk)
+
+    return chunk, text
+
+
+def main() -> None:
+    chunk, text = dense_chunk()
+    spans = text.count("<span")
+
+    start = time.perf_counter()
+    reinsert_tags(text, chunk)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{spans} spans  {elapsed * 1000:8.1f} ms  "
+        f"{elapsed / spans * 1e6:6.1f} us/span"
+    )
+
+
+if __name__ == "__main__":
+    main()
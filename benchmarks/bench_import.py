@@ -0,0 +1,74 @@
+"""Benchmark for the cold import time of the package.
+
+Run with ``python benchmarks/bench_import.py [module ...]``. Each module is
+imported in fresh interpreters, and the median wall time on top of the
+interpreter start-up is reported, next to that of lxml.etree, which every
+module needs. The slowest imports are listed from ``-X importtime``.
+Bytecode is compiled beforehand, as it would be in an installed package.
+"""
+
+import compileall
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+import time
+
+import xmlparser
+
+RUNS = 20
+ENV = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+ENV.pop("PYTHONDONTWRITEBYTECODE", None)
+
+
+def wall_time(code: str) -> float:
+    """Return the median time, in milliseconds, to run `code` in a new
+    interpreter."""
+    times = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], env=ENV, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1e3
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Return the cumulative time, in microseconds, spent importing `module`
+    and each of its imports in a new interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=ENV,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main(modules: tuple[str, ...] = ("xmlparser",)) -> None:
+    compileall.compile_dir(pathlib.Path(xmlparser.__file__).parent, quiet=1)
+
+    bare = wall_time("pass")
+    print(f"{'interpreter':<20} {bare:6.1f} ms")
+    for module in ("lxml.etree", *modules):
+        print(f"{module:<20} {wall_time(f'import {module}') - bare:6.1f} ms")
+
+    for module in modules:
+        times = import_times(module)
+        assert "nltk" not in times, f"{module} imports nltk"
+
+        print(f"\nslowest imports of {module} (-X importtime):")
+        slowest = sorted(times.items(), key=lambda item: item[1])[-6:-1]
+        for name, micros in reversed(slowest):
+            print(f"  {name:<30} {micros / 1e3:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main(tuple(sys.argv[1:]) or ("xmlparser",))
@@ -0,0 +1,52 @@
+"""Benchmark the cost of the stage instrumentation.
+
+Run with ``python benchmarks/bench_instrument.py``. An article is chunked by
+the undecorated functions, by the stages with instrumentation off, and inside
+`instrument`, which prints the per-stage report at the end.
+"""
+
+import timeit
+from io import BytesIO
+
+from lxml.etree import parse
+
+from corpus import article
+from xmlparser import xmlparser
+from xmlparser.instrument import instrument
+
+NUMBER = 20
+
+
+def chunk(source: bytes) -> None:
+    list(xmlparser.get_chunks(parse(BytesIO(source))))
+
+
+def main() -> None:
+    source = article(200, density=0.2)
+    names = (
+        "get_chunks",
+        "get_segments",
+        "transform_tree",
+        "clean_namespaces",
+        "build_chunk",
+    )
+    stages = {name: getattr(xmlparser, name) for name in names}
+
+    for name, func in stages.items():
+        setattr(xmlparser, name, func.__wrapped__)
+    bare = min(timeit.repeat(lambda: chunk(source), number=NUMBER, repeat=5))
+    for name, func in stages.items():
+        setattr(xmlparser, name, func)
+
+    off = min(timeit.repeat(lambda: chunk(source), number=NUMBER, repeat=5))
+    with instrument() as stats:
+        on = min(timeit.repeat(lambda: chunk(source), number=NUMBER, repeat=5))
+
+    for label, seconds in (("undecorated", bare), ("off", off), ("on", on)):
+        print(f"{label:<12} {seconds / NUMBER * 1e3:8.3f} ms per article")
+    print()
+    print(stats.report())
+
+
+if __name__ == "__main__":
+    main()
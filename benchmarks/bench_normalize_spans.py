@@ -0,0 +1,42 @@
+"""Scaling benchmark for merging runs of equal spans.
+
+Run with ``python benchmarks/bench_normalize_spans.py``. A run of k spans with
+the same attributes is merged into one span; the time per span should stay
+roughly flat as k grows.
+"""
+
+import sys
+import time
+
+from lxml.etree import fromstring
+
+from xmlparser.xmlparser import normalize_spans
+
+SIZES = (1_000, 10_000, 100_000)
+
+
+def span_run(k: int) -> str:
+    span = '<span typeof="d3o:Strain"><italic>P</italic>2<sub>1</sub></span>'
+    return f"<p>{span * k}</p>"
+
+
+def main(sizes: tuple[int, ...] = SIZES) -> None:
+    baseline = None
+    for k in sizes:
+        tree = fromstring(span_run(k)).getroottree()
+
+        start = time.perf_counter()
+        normalize_spans(tree)
+        elapsed = time.perf_counter() - start
+
+        assert len(tree.getroot()) == 1
+        per_span = elapsed / k * 1e6
+        baseline = baseline or per_span
+        print(
+            f"{k:>8} spans  {elapsed:8.3f} s  "
+            f"{per_span:6.2f} us/span  x{per_span / baseline:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main(tuple(int(k) for k in sys.argv[1:]) or SIZES)
@@ -0,0 +1,52 @@
+"""Benchmark the transformation of articles read from different sources.
+
+Run with ``python benchmarks/bench_open_article.py``. A large article with
+``<hr>`` tags is transformed from bytes, from a gzipped file, and from a
+memory map of the file, and the time and the peak of Python allocations are
+reported for each.
+"""
+
+import gzip
+import mmap
+import pathlib
+import tempfile
+import time
+import tracemalloc
+
+from corpus import article
+from xmlparser.xmlparser import transform_article
+
+
+def main() -> None:
+    xml = article(2000, density=0.2).replace(b"</article>", b"<hr></article>")
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = pathlib.Path(tmp, "article.xml")
+        plain.write_bytes(xml)
+        gzipped = pathlib.Path(tmp, "article.xml.gz")
+        gzipped.write_bytes(gzip.compress(xml))
+
+        def mapped() -> bytes:
+            with open(plain, "rb") as file:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    return transform_article(m)
+
+        cases = {
+            "bytes": lambda: transform_article(xml),
+            "path": lambda: transform_article(plain),
+            "gzipped path": lambda: transform_article(gzipped),
+            "mmap": mapped,
+        }
+
+        print(f"article: {len(xml) / 2**20:.2f} MiB")
+        for name, func in cases.items():
+            tracemalloc.start()
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{name:<14} {elapsed:6.3f} s  peak {peak / 2**20:6.2f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Scaling benchmark for `reinsert_tags`.
+
+Run with ``python benchmarks/bench_reinsert_tags.py``. The time per element
+should stay roughly flat as the number of inline elements grows.
+"""
+
+import sys
+import time
+
+from xmlparser.xmlparser import remove_tags, reinsert_tags
+
+SIZES = (1_000, 10_000, 100_000)
+
+
+def inline_article(n: int) -> str:
+    """Return a paragraph with `n` inline elements."""
+    body = "".join(
+        f"<italic>gene{i}</italic> and <xref>{i}</xref> "
+        for i in range(n // 2)
+    )
+    return f"<p>{body}</p>"
+
+
+def annotate(text: str) -> str:
+    """Wrap every other word of `text` in an entity span."""
+    words = text.split(" ")
+    return " ".join(
+        f'<span typeof="d3o:Gene">{word}</span>' if i % 4 == 0 else word
+        for i, word in enumerate(words)
+    )
+
+
+def main(sizes: tuple[int, ...] = SIZES) -> None:
+    baseline = None
+    for n in sizes:
+        xml = inline_article(n)
+        annotated = annotate(remove_tags(xml))
+
+        start = time.perf_counter()
+        reinsert_tags(annotated, xml)
+        elapsed = time.perf_counter() - start
+
+        per_element = elapsed / n * 1e6
+        baseline = baseline or per_element
+        print(
+            f"{n:>8} elements  {elapsed:8.3f} s  "
+            f"{per_element:6.2f} us/element  x{per_element / baseline:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main(tuple(int(n) for n in sys.argv[1:]) or SIZES)
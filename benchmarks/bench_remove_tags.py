@@ -0,0 +1,81 @@
+"""Compare the ways of getting the plain text out of 1 MB of markup.
+
+Run with ``python benchmarks/bench_remove_tags.py``. ``split + join`` is what
+remove_tags did with nltk's RegexpTokenizer(gaps=True), and ``tokenize_xml``
+is the per-character tokenisation of the same input.
+"""
+
+import itertools
+import time
+from collections.abc import Callable
+
+from xmlparser.xmlparser import (
+    remove_tags,
+    tag_regex,
+    text_spans,
+    tokenize_xml,
+)
+
+SIZE = 1_000_000
+REPEAT = 5
+
+
+def annotated_text(size: int = SIZE) -> str:
+    words = itertools.cycle(
+        [
+            '<span typeof="d3o:Gene">lacZ</span>',
+            "was",
+            "<italic>expressed</italic>",
+            "in",
+            "<sc>l</sc>-tryptophan",
+        ]
+    )
+    parts: list[str] = []
+    length = 0
+    while length < size:
+        parts.append(next(words))
+        length += len(parts[-1]) + 1
+    return " ".join(parts)
+
+
+def split_and_join(xml: str) -> str:
+    return "".join(token for token in tag_regex.split(xml) if token)
+
+
+def best_of(func: Callable[[], object]) -> float:
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    text = annotated_text()
+    data = text.encode()
+    view = memoryview(data)
+
+    expected = split_and_join(text)
+    assert remove_tags(text) == expected
+    assert remove_tags(view) == expected.encode()
+    spans = text_spans(view)
+    assert b"".join(view[s:e] for s, e in zip(spans[::2], spans[1::2])) == (
+        expected.encode()
+    )
+
+    cases: dict[str, Callable[[], object]] = {
+        "split + join (str)": lambda: split_and_join(text),
+        "tokenize_xml (str)": lambda: tokenize_xml(text),
+        "remove_tags (str)": lambda: remove_tags(text),
+        "remove_tags (memoryview)": lambda: remove_tags(view),
+        "text_spans (str)": lambda: text_spans(text),
+        "text_spans (memoryview)": lambda: text_spans(view),
+    }
+    print(f"{len(data) / 1e6:.1f} MB, {len(spans) // 2} text spans")
+    for name, func in cases.items():
+        print(f"  {name:<26} {best_of(func) * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Scaling benchmark for the thread-pool batch mode.
+
+Run with ``python benchmarks/bench_threads.py [max threads]``. A set of
+articles is transformed with `transform_batch` and chunked with `run_batch`
+on 1 to N threads, N being the number of CPUs by default. The speedup is
+relative to a single thread; on a single CPU it stays around 1.
+"""
+
+import os
+import sys
+import time
+
+from corpus import article
+from xmlparser.batch import run_batch, transform_batch
+
+ARTICLES = 64
+
+
+def main(max_threads: int) -> None:
+    articles = [
+        article(100, density=0.2, seed=seed) for seed in range(ARTICLES)
+    ]
+    sources = [(str(seed), source) for seed, source in enumerate(articles)]
+    cases = {
+        "transform_batch": lambda n: list(
+            transform_batch(articles, workers=n)
+        ),
+        "run_batch": lambda n: list(
+            run_batch(sources, workers=n, threads=True)
+        ),
+    }
+
+    threads = sorted(
+        {2**i for i in range(max_threads.bit_length())} | {max_threads}
+    )
+    for name, func in cases.items():
+        func(1)
+        baseline = None
+        for n in threads:
+            start = time.perf_counter()
+            func(n)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(
+                f"{name:<16} {n:>3} threads  {ARTICLES / elapsed:8.1f} "
+                f"articles/s  x{baseline / elapsed:.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if sys.argv[1:] else os.cpu_count() or 1)
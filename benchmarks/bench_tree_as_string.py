@@ -0,0 +1,36 @@
+"""Benchmark the serialisation of whole articles.
+
+Run with ``python benchmarks/bench_tree_as_string.py``. An article is
+serialised to a string with and without canonicalisation, and written to a
+binary stream by `write_tree`.
+"""
+
+import timeit
+from io import BytesIO
+
+from lxml.etree import parse
+
+from corpus import article
+from xmlparser.xmlparser import tree_as_string, write_tree
+
+NUMBER = 10
+
+
+def main() -> None:
+    tree = parse(BytesIO(article(500, density=0.2)))
+    cases = {
+        "tree_as_string, C14N 2.0": lambda: tree_as_string(tree),
+        "tree_as_string, plain": lambda: tree_as_string(tree, canonical=False),
+        "write_tree, C14N 2.0": lambda: write_tree(tree, BytesIO()),
+        "write_tree, plain": lambda: write_tree(
+            tree, BytesIO(), canonical=False
+        ),
+    }
+
+    for name, func in cases.items():
+        seconds = min(timeit.repeat(func, number=NUMBER, repeat=3)) / NUMBER
+        print(f"{name:<26} {seconds * 1e3:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Synthetic JATS articles for the benchmarks.
+
+Everything is generated offline from a seed, so that two runs of the suite on
+different commits measure exactly the same input. Three knobs shape an
+article:
+
+- `paragraphs`: the size of the body;
+- `density`: the fraction of words wrapped in inline markup;
+- `nesting`: how many inline elements (or entity spans) are stacked on a
+  marked word.
+
+Run ``python benchmarks/corpus.py [paragraphs]`` to print an article.
+"""
+
+import random
+import re
+import sys
+
+JATS = "https://jats.nlm.nih.gov/ns/archiving/1.3/"
+XLINK = "http://www.w3.org/1999/xlink"
+PREFIX = "d3o: https://purl.dsmz.de/schema/"
+
+WORDS = (
+    "the strain was grown on medium with glucose and cholesterol oxidase "
+    "activity increased in cells of Rhodococcus erythropolis under aerobic "
+    "conditions while extracellular enzyme production stopped after hours "
+    "of fermentation at constant pH"
+).split()
+INLINE = ("italic", "bold", "sc", "sub", "sup")
+TYPES = ("d3o:Strain", "d3o:Bacteria", "d3o:Enzyme", "d3o:Compound", "OOS")
+
+
+def sentence(rng: random.Random, words: int) -> list[str]:
+    chosen = rng.choices(WORDS, k=words)
+    chosen[0] = chosen[0].capitalize()
+    chosen[-1] += "."
+    return chosen
+
+
+def marked_up(
+    rng: random.Random, words: list[str], density: float, nesting: int
+) -> str:
+    """Join `words`, wrapping a fraction `density` of them in inline markup."""
+    out = []
+    for i, word in enumerate(words):
+        if rng.random() < density:
+            if rng.random() < 0.2:
+                word = f'<xref ref-type="bibr" rid="B{i}">{word}</xref>'
+            else:
+                for tag in rng.sample(INLINE, k=min(nesting, len(INLINE))):
+                    word = f"<{tag}>{word}</{tag}>"
+        out.append(word)
+
+    return " ".join(out)
+
+
+def paragraph(
+    rng: random.Random, density: float, nesting: int, sentences: int = 6
+) -> str:
+    words = [w for _ in range(sentences) for w in sentence(rng, 18)]
+    return f"<p>{marked_up(rng, words, density, nesting)}</p>"
+
+
+def article(
+    paragraphs: int = 50,
+    density: float = 0.1,
+    nesting: int = 1,
+    seed: int = 0,
+) -> bytes:
+    """Return a JATS article with `paragraphs` paragraphs in its body."""
+    rng = random.Random(seed)
+    body: list[str] = []
+    for i in range(paragraphs):
+        if i % 8 == 0:
+            body.append(f"<h2>Section {i // 8 + 1}</h2>")
+        body.append(paragraph(rng, density, nesting))
+        if i % 10 == 9:
+            body.append(
+                f'<fig id="F{i}"><label>Figure {i}</label><caption>'
+                f"{paragraph(rng, density, nesting, sentences=1)}"
+                f'</caption><graphic xlink:href="f{i}"/></fig>'
+            )
+
+    title = marked_up(rng, sentence(rng, 12), density, nesting)
+    abstract = paragraph(rng, density, nesting, sentences=4)
+    newline = "\n"
+
+    return (
+        f'<article xmlns="{JATS}" xmlns:xlink="{XLINK}">\n'
+        "<front><journal-meta>"
+        "<journal-title>Synthetic Journal</journal-title>"
+        "</journal-meta><article-meta>"
+        f'<article-id pub-id-type="pmid">{seed + 1}</article-id>'
+        f'<article-id pub-id-type="doi">10.1000/synthetic.{seed}</article-id>'
+        f"<title-group><article-title>{title}</article-title></title-group>"
+        "</article-meta></front>\n"
+        f'<div class="abstract">{abstract}</div>\n'
+        f'<div class="article-body">\n{newline.join(body)}\n</div>\n'
+        "</article>"
+    ).encode()
+
+
+def annotated(
+    text: str, density: float = 0.1, nesting: int = 1, seed: int = 0
+) -> str:
+    """Wrap a fraction `density` of the words of `text` in entity spans.
+
+    `text` must be plain text. With `nesting` above one, a marked word is
+    wrapped in several spans, the outer ones also covering the next word.
+    """
+    rng = random.Random(seed)
+    pieces = re.split(r"(\s+)", text)
+    out: list[str] = []
+    i = 0
+    while i < len(pieces):
+        piece = pieces[i]
+        if not piece.strip() or rng.random() >= density:
+            out.append(piece)
+            i += 1
+            continue
+
+        entity = piece
+        for depth in range(nesting):
+            if depth and i + 2 < len(pieces):
+                entity += pieces[i + 1] + pieces[i + 2]
+                i += 2
+            entity = (
+                f'<span class="entity" resource="#T{i}" '
+                f'typeof="{rng.choice(TYPES)}">{entity}</span>'
+            )
+        out.append(entity)
+        i += 1
+
+    return "".join(out)
+
+
+def annotation_document(chunk: str, annotated_text: str) -> tuple[str, str]:
+    """Return the stored annotation of `chunk` and a replacement for it.
+
+    These are the `original` and `replacement` arguments of
+    `replace_annotation`.
+    """
+    original = (
+        "<annotation><journal-meta><journal-title>Synthetic Journal"
+        "</journal-title></journal-meta><article-meta></article-meta>"
+        f"{chunk}</annotation>"
+    )
+    replacement = (
+        f'<div class="chunk-body" prefix="{PREFIX}">{annotated_text}</div>'
+    )
+    return original, replacement
+
+
+if __name__ == "__main__":
+    print(article(int(sys.argv[1]) if sys.argv[1:] else 10).decode())
@@ -0,0 +1,184 @@
+"""Benchmark suite for the whole pipeline.
+
+Run with ``python benchmarks/suite.py -o results.json``. Every benchmark runs
+on synthetic articles from `corpus`, scaled in size, markup density and span
+nesting, and the timings are written as JSON together with the commit and the
+versions they were measured with. Pass ``--compare base.json`` to print the
+ratio to an earlier run, for instance one made on the main branch::
+
+    git stash && python benchmarks/suite.py -o base.json && git stash pop
+    python benchmarks/suite.py -o head.json --compare base.json
+
+``--quick`` runs the smallest articles only, ``-k`` selects benchmarks whose
+name contains the given string.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Callable, Iterator
+from datetime import datetime, timezone
+from io import BytesIO
+from itertools import product
+from typing import Any, NamedTuple
+
+import lxml
+from lxml.etree import parse
+
+from corpus import annotated, annotation_document, article
+from xmlparser.xmlparser import (
+    get_chunks,
+    get_text,
+    reinsert_tags,
+    remove_tags,
+    replace_annotation,
+    transform_article,
+)
+
+SIZES = (10, 100, 1_000)
+DENSITIES = (0.05, 0.3)
+NESTINGS = (1, 3)
+
+
+class Benchmark(NamedTuple):
+    name: str
+    params: dict[str, Any]
+    func: Callable[[], object]
+
+
+def parsed(source: bytes):
+    return parse(BytesIO(source))
+
+
+def whole_chunk(source: bytes) -> str:
+    """Return the body of the article in `source` as a single chunk."""
+    tree = parsed(source)
+    *_, body = get_chunks(tree, minlen=sys.maxsize, maxlen=sys.maxsize)
+    return body.content
+
+
+def benchmarks(sizes: tuple[int, ...]) -> Iterator[Benchmark]:
+    """Yield every benchmark, its input already built."""
+    for paragraphs, density, nesting in product(sizes, DENSITIES, NESTINGS):
+        params = {
+            "paragraphs": paragraphs,
+            "density": density,
+            "nesting": nesting,
+        }
+        source = article(paragraphs, density, nesting)
+        tree = parsed(source)
+        chunk = whole_chunk(source)
+        entities = annotated(remove_tags(chunk), density, nesting)
+        original, replacement = annotation_document(chunk, entities)
+
+        yield Benchmark(
+            "transform_article", params, lambda: transform_article(source)
+        )
+        yield Benchmark("get_text", params, lambda: get_text(tree))
+        yield Benchmark(
+            "get_chunks", params, lambda: list(get_chunks(parsed(source)))
+        )
+        yield Benchmark(
+            "remove_tags", params, lambda: remove_tags(source.decode())
+        )
+        yield Benchmark(
+            "reinsert_tags", params, lambda: reinsert_tags(entities, chunk)
+        )
+        yield Benchmark(
+            "replace_annotation",
+            params,
+            lambda: replace_annotation(original, replacement),
+        )
+
+
+def measure(func: Callable[[], object], repeat: int) -> dict[str, float]:
+    """Time `func`, calling it often enough for each sample to last 50 ms."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        if time.perf_counter() - start >= 0.05 or number >= 10_000:
+            break
+        number *= 4
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def environment() -> dict[str, str | None]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "lxml": lxml.__version__,
+        "machine": platform.machine(),
+    }
+
+
+def key(result: dict[str, Any]) -> str:
+    params = ", ".join(f"{k}={v}" for k, v in result["params"].items())
+    return f"{result['name']}({params})"
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", help="write the results as JSON")
+    parser.add_argument("--compare", help="results of an earlier run")
+    parser.add_argument("-k", default="", help="only run matching benchmarks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--quick", action="store_true", help="only run the smallest articles"
+    )
+    args = parser.parse_args(argv)
+
+    base = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            base = {key(r): r for r in json.load(file)["results"]}
+
+    results = []
+    for name, params, func in benchmarks(SIZES[:1] if args.quick else SIZES):
+        if args.k not in name:
+            continue
+        result = {"name": name, "params": params}
+        result |= measure(func, args.repeat)
+        results.append(result)
+
+        line = f"{key(result):<62} {result['min'] * 1e3:10.3f} ms"
+        if key(result) in base:
+            line += f"  x{result['min'] / base[key(result)]['min']:.2f}"
+        print(line, flush=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({**environment(), "results": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
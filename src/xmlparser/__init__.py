@@ -1,15 +1,24 @@
 from .xmlparser import (
+    ChunkBatch,
+    OffsetMap,
+    TextChunk,
     XMLSyntaxError,
+    annotate_spans,
     clean_namespaces,
     concat,
     get_doi,
     get_metadata,
     get_pmid,
     get_segments,
+    register_stylesheet,
     reinsert_tags,
     remove_tags,
+    remove_tags_with_offsets,
     replace_annotation,
+    stylesheets,
+    text_spans,
     transform_article,
     transform_tree,
     tree_as_string,
+    write_tree,
 )
@@ -0,0 +1,118 @@
+"""asyncio front end for processing articles from many sources at once.
+
+Articles are read concurrently, from local paths or through any coroutine
+function, say a client for an object store, while parsing, transformation
+and chunking run on an executor::
+
+    async for result in iter_chunks(sources, max_in_flight=16):
+        store(result)
+
+Results come out as they are ready, not in the order of the sources.
+"""
+
+import asyncio
+import os
+import pathlib
+from collections.abc import (
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+)
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+from .batch import BatchResult, in_context, process_article
+from .xmlparser import stylesheets
+
+Payload = str | os.PathLike[str] | bytes | Callable[[], Awaitable[bytes]]
+AsyncSource = tuple[str, Payload]
+
+
+async def iter_chunks(
+    sources: Iterable[AsyncSource] | AsyncIterable[AsyncSource],
+    executor: Executor | None = None,
+    max_in_flight: int = 8,
+    minlen: int = 4000,
+    maxlen: int = 6000,
+) -> AsyncIterator[BatchResult]:
+    """Process `sources` like `run_batch`, yielding results as they are
+    ready.
+
+    Each source is a name and either the article bytes, a path, or a
+    coroutine function returning the bytes. At most `max_in_flight` articles
+    are being read, processed or waiting to be consumed at any time, so a slow
+    consumer holds back the reading of further sources. As in `run_batch`,
+    errors are recorded in the results instead of being raised.
+
+    :param executor: Where parsing, transformation and chunking run. By
+        default, a pool of threads, one per CPU, shut down at the end.
+    """
+    loop = asyncio.get_running_loop()
+    own_executor = executor is None
+    pool = executor or ThreadPoolExecutor(initializer=stylesheets.warm)
+
+    slots = asyncio.Semaphore(max_in_flight)
+    results: asyncio.Queue[BatchResult | None] = asyncio.Queue()
+    running: set[asyncio.Task[None]] = set()
+
+    async def process(source: str, payload: Payload) -> None:
+        try:
+            data = await load(payload)
+            result = await loop.run_in_executor(
+                pool,
+                in_context(pool, process_article),
+                source,
+                data,
+                minlen,
+                maxlen,
+            )
+        except Exception as e:
+            result = BatchResult(
+                source=source, error=f"{type(e).__name__}: {e}"
+            )
+        await results.put(result)
+
+    async def produce() -> None:
+        try:
+            async for source, payload in aiterate(sources):
+                await slots.acquire()
+                task = asyncio.create_task(process(source, payload))
+                running.add(task)
+                task.add_done_callback(running.discard)
+            await asyncio.gather(*running)
+        finally:
+            await results.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (result := await results.get()) is not None:
+            slots.release()
+            yield result
+        await producer
+    finally:
+        producer.cancel()
+        for task in list(running):
+            task.cancel()
+        if own_executor:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def load(payload: Payload) -> bytes:
+    """Return the article bytes designated by `payload`."""
+    if isinstance(payload, bytes):
+        return payload
+    if isinstance(payload, (str, os.PathLike)):
+        return await asyncio.to_thread(pathlib.Path(payload).read_bytes)
+    return await payload()
+
+
+async def aiterate(
+    items: Iterable[AsyncSource] | AsyncIterable[AsyncSource],
+) -> AsyncIterator[AsyncSource]:
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
@@ -0,0 +1,359 @@
+"""Batch processing of JATS article collections across a process pool.
+
+Run ``python -m xmlparser.batch --help`` (or ``xmlparser-batch``) for the
+command line interface.
+"""
+
+import argparse
+import contextvars
+import functools
+import glob
+import json
+import os
+import pathlib
+import sys
+import tarfile
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from dataclasses import asdict, dataclass, field
+from typing import IO, Any, TypeVar
+
+from lxml.etree import parse
+
+from .xmlparser import (
+    TextChunk,
+    get_chunks,
+    get_text,
+    open_article,
+    stylesheets,
+    tar_members,
+    transform_article,
+)
+
+XML_SUFFIXES = (".xml", ".nxml", ".xml.gz", ".nxml.gz")
+
+Source = tuple[str, str | bytes]
+
+T = TypeVar("T")
+
+
+@dataclass
+class BatchResult:
+    """Data class for the outcome of processing one article."""
+
+    source: str
+    pmid: int | None = None
+    doi: str | None = None
+    metadata: str | None = None
+    pmcid: str | None = None
+    title: str | None = None
+    journal: str | None = None
+    chunks: list[TextChunk] = field(default_factory=list)
+    error: str | None = None
+
+
+@dataclass
+class BatchStats:
+    """Data class for the throughput of a batch run."""
+
+    files: int = 0
+    failures: int = 0
+    bytes: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+
+    def update(self, result: BatchResult, size: int) -> None:
+        self.files += 1
+        self.bytes += size
+        self.chunks += len(result.chunks)
+        if result.error is not None:
+            self.failures += 1
+
+    def report(self) -> str:
+        seconds = self.seconds or float("nan")
+        return (
+            f"{self.files} files ({self.failures} failed), "
+            f"{self.chunks} chunks in {self.seconds:.1f} s: "
+            f"{self.files / seconds:.1f} files/s, "
+            f"{self.bytes / seconds / 2**20:.2f} MiB/s"
+        )
+
+
+def iter_sources(spec: str) -> Iterator[Source]:
+    """Expand `spec` into the articles it designates.
+
+    `spec` can be a directory (searched recursively), a tarball, possibly
+    compressed, or a glob pattern. Files are passed on as paths, tarball
+    members as their content.
+    """
+    path = pathlib.Path(spec)
+
+    if path.is_dir():
+        for file in sorted(path.rglob("*")):
+            if file.name.endswith(XML_SUFFIXES) and file.is_file():
+                yield str(file), str(file)
+    elif path.is_file() and tarfile.is_tarfile(path):
+        for name, stream in tar_members(path, suffixes=XML_SUFFIXES):
+            yield f"{spec}:{name}", stream.read()
+    elif path.is_file():
+        yield str(path), str(path)
+    else:
+        for file in sorted(glob.glob(spec, recursive=True)):
+            yield from iter_sources(file)
+
+
+def process_article(
+    source: str,
+    payload: str | bytes | IO[bytes],
+    minlen: int = 4000,
+    maxlen: int = 6000,
+) -> BatchResult:
+    """Extract the description and the chunks of a single article.
+
+    Any error is recorded in the result instead of being raised, so that a
+    broken article does not bring down the rest of the batch.
+    """
+    try:
+        with open_article(payload) as stream:
+            tree = parse(stream)
+        text = get_text(tree)
+        chunks = list(get_chunks(tree, minlen=minlen, maxlen=maxlen))
+    except Exception as e:
+        return BatchResult(source=source, error=f"{type(e).__name__}: {e}")
+
+    return BatchResult(source=source, chunks=chunks, **asdict(text))
+
+
+def in_context(executor: Executor, func: Callable[..., T]) -> Callable[..., T]:
+    """Bind `func` to a copy of the current context if `executor` runs
+    threads, so that the stages it runs are recorded by the `instrument`
+    block of the caller."""
+    if isinstance(executor, ThreadPoolExecutor):
+        return functools.partial(contextvars.copy_context().run, func)
+    return func
+
+
+def _warm_worker() -> None:
+    stylesheets.warm()
+
+
+def _size(payload: str | bytes) -> int:
+    if isinstance(payload, bytes):
+        return len(payload)
+    try:
+        return os.path.getsize(payload)
+    except OSError:
+        return 0
+
+
+def run_batch(
+    sources: Iterable[Source],
+    workers: int | None = None,
+    minlen: int = 4000,
+    maxlen: int = 6000,
+    stats: BatchStats | None = None,
+    threads: bool = False,
+) -> Iterator[BatchResult]:
+    """Process `sources` across a pool of `workers` processes.
+
+    Results come out in the order of `sources`. At most a few articles per
+    worker are in flight at any time, so arbitrarily large collections can be
+    streamed through.
+
+    :param workers: Number of processes, by default one per CPU. With a single
+        worker, everything runs in the calling process.
+    :param stats: If given, updated with the throughput of the run.
+    :param threads: Use a pool of threads instead. lxml releases the GIL
+        while parsing and transforming, and the articles need not be pickled
+        to reach the workers.
+    """
+    stats = stats if stats is not None else BatchStats()
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+
+    if workers == 1:
+        _warm_worker()
+        for source, payload in sources:
+            result = process_article(source, payload, minlen, maxlen)
+            stats.update(result, _size(payload))
+            stats.seconds = time.perf_counter() - start
+            yield result
+        return
+
+    pending: deque[tuple[Future[BatchResult], int]] = deque()
+    executor = ThreadPoolExecutor if threads else ProcessPoolExecutor
+    with executor(workers, initializer=_warm_worker) as pool:
+        for source, payload in sources:
+            future = pool.submit(
+                in_context(pool, process_article),
+                source,
+                payload,
+                minlen,
+                maxlen,
+            )
+            pending.append((future, _size(payload)))
+            if len(pending) >= 4 * workers:
+                yield _collect(pending.popleft(), stats, start)
+
+        while pending:
+            yield _collect(pending.popleft(), stats, start)
+
+
+def _collect(
+    item: tuple[Future[BatchResult], int], stats: BatchStats, start: float
+) -> BatchResult:
+    future, size = item
+    result = future.result()
+    stats.update(result, size)
+    stats.seconds = time.perf_counter() - start
+    return result
+
+
+def transform_batch(
+    articles: Iterable[str | bytes],
+    workers: int | None = None,
+    style: str = "jats",
+) -> Iterator[bytes]:
+    """Apply `transform_article` to `articles` across a pool of `workers`
+    threads, one per CPU by default.
+
+    Results come out in the order of `articles`, with a few articles per
+    worker in flight at any time, as in `run_batch`.
+    """
+    workers = workers or os.cpu_count() or 1
+    pending: deque[Future[bytes]] = deque()
+
+    with ThreadPoolExecutor(workers, initializer=_warm_worker) as pool:
+        for article in articles:
+            pending.append(
+                pool.submit(
+                    in_context(pool, transform_article), article, style
+                )
+            )
+            if len(pending) >= 4 * workers:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_jsonl(results: Iterable[BatchResult], file: IO[str]) -> None:
+    for result in results:
+        file.write(json.dumps(asdict(result), ensure_ascii=False))
+        file.write("\n")
+
+
+def write_parquet(
+    results: Iterable[BatchResult], path: str, batch_size: int = 1024
+) -> None:
+    """Write `results` to a Parquet file, `batch_size` rows at a time.
+
+    :raises ImportError: pyarrow is not installed.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        e.add_note("Parquet output requires pyarrow (pip install pyarrow)")
+        raise
+
+    schema = pa.schema(
+        [
+            ("source", pa.string()),
+            ("pmid", pa.int64()),
+            ("doi", pa.string()),
+            ("metadata", pa.string()),
+            ("pmcid", pa.string()),
+            ("title", pa.string()),
+            ("journal", pa.string()),
+            (
+                "chunks",
+                pa.list_(
+                    pa.struct([("content", pa.string()), ("pos", pa.int64())])
+                ),
+            ),
+            ("error", pa.string()),
+        ]
+    )
+
+    with pq.ParquetWriter(path, schema) as writer:
+        rows: list[dict[str, Any]] = []
+        for result in results:
+            rows.append(asdict(result))
+            if len(rows) >= batch_size:
+                writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+                rows = []
+        if rows:
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="xmlparser-batch",
+        description="Extract metadata and chunks from JATS articles.",
+    )
+    parser.add_argument(
+        "inputs", nargs="+", help="directories, tarballs or glob patterns"
+    )
+    parser.add_argument(
+        "-o", "--output", default="-", help="output file (default: stdout)"
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=("jsonl", "parquet"),
+        help="output format (default: from the output suffix, else jsonl)",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        help="number of processes (default: all CPUs)",
+    )
+    parser.add_argument(
+        "--threads",
+        action="store_true",
+        help="run the workers as threads of a single process",
+    )
+    parser.add_argument("--minlen", type=int, default=4000)
+    parser.add_argument("--maxlen", type=int, default=6000)
+    args = parser.parse_args(argv)
+
+    output_format = args.format or (
+        "parquet" if args.output.endswith(".parquet") else "jsonl"
+    )
+    sources = (source for spec in args.inputs for source in iter_sources(spec))
+    stats = BatchStats()
+    results = run_batch(
+        sources,
+        workers=args.workers,
+        minlen=args.minlen,
+        maxlen=args.maxlen,
+        stats=stats,
+        threads=args.threads,
+    )
+
+    if output_format == "parquet":
+        if args.output == "-":
+            parser.error("Parquet output needs an output file")
+        write_parquet(results, args.output)
+    elif args.output == "-":
+        write_jsonl(results, sys.stdout)
+    else:
+        with open(args.output, "w", encoding="utf-8") as file:
+            write_jsonl(results, file)
+
+    print(stats.report(), file=sys.stderr)
+
+    return 0 if not stats.failures else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
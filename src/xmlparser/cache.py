@@ -0,0 +1,221 @@
+"""Persistent cache of transformed articles and their chunks.
+
+Entries are addressed by the SHA-256 of the article bytes, the digest of the
+stylesheet and the chunking parameters, so that editing a stylesheet or
+changing `minlen` and `maxlen` never serves stale results. They live in a
+single SQLite database, compressed, and the least recently used ones are
+evicted once the cache grows past its size limit::
+
+    cache = ArticleCache("articles.sqlite", max_bytes=2**30)
+    chunks = cache.chunks(xml, minlen=4000, maxlen=6000)
+
+The database is in WAL mode, so that any number of threads and processes
+can share it. A hit is served without parsing the article.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from .xmlparser import (
+    TextChunk,
+    get_chunks,
+    parse_file,
+    stylesheets,
+    transform_article,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS usage (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO usage VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    UPDATE usage SET bytes = bytes + new.size;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries
+BEGIN
+    UPDATE usage SET bytes = bytes + new.size - old.size;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    UPDATE usage SET bytes = bytes - old.size;
+END;
+"""
+
+
+@dataclass
+class CacheStats:
+    """Data class for the hits and misses of a cache in this process."""
+
+    hits: int = 0
+    misses: int = 0
+
+
+class ArticleCache:
+    """Size-bounded, content-addressed cache of transformed articles and
+    chunk lists, shared across threads and processes.
+
+    :param path: SQLite database, created if needed.
+    :param max_bytes: Upper bound on the compressed size of the entries.
+    :param timeout: Seconds to wait for another process holding the lock.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        max_bytes: int = 2**30,
+        timeout: float = 30.0,
+    ) -> None:
+        self.path = os.fspath(path)
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.stats = CacheStats()
+        self._local = threading.local()
+        with self._connection() as db:
+            db.executescript(SCHEMA)
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Connections cannot cross process boundaries; workers open their own.
+        state = self.__dict__.copy()
+        del state["_local"]
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        db: sqlite3.Connection | None = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=self.timeout)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def transform(
+        self, article_xml: str | bytes, style: str = "jats"
+    ) -> bytes:
+        """Return `transform_article(article_xml, style)`, cached."""
+        if isinstance(article_xml, str):
+            article_xml = article_xml.encode()
+
+        key = self.key(article_xml, "transform", stylesheets.digest(style))
+        value = self.get(key)
+        if value is None:
+            value = transform_article(article_xml, style=style)
+            self.put(key, value)
+
+        return value
+
+    def chunks(
+        self,
+        article_xml: bytes,
+        minlen: int = 4000,
+        maxlen: int = 6000,
+        pretty_print: bool = True,
+    ) -> list[TextChunk]:
+        """Return the chunks of `get_chunks` for the article in
+        `article_xml`, possibly gzipped, cached."""
+        key = self.key(
+            article_xml,
+            "chunks",
+            stylesheets.digest("jats"),
+            minlen,
+            maxlen,
+            pretty_print,
+        )
+        value = self.get(key)
+        if value is not None:
+            return [TextChunk(**chunk) for chunk in json.loads(value)]
+
+        tree = parse_file(article_xml)
+        chunks = list(
+            get_chunks(
+                tree, minlen=minlen, maxlen=maxlen, pretty_print=pretty_print
+            )
+        )
+        self.put(
+            key,
+            json.dumps(list(map(asdict, chunks)), ensure_ascii=False).encode(),
+        )
+
+        return chunks
+
+    @staticmethod
+    def key(data: bytes, *params: object) -> str:
+        """Return the address of the result of processing `data` with
+        `params`."""
+        digest = hashlib.sha256(data)
+        digest.update(json.dumps(params).encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> bytes | None:
+        db = self._connection()
+        row = db.execute(
+            "SELECT value FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.stats.misses += 1
+            return None
+
+        self.stats.hits += 1
+        with db:
+            db.execute(
+                "UPDATE entries SET accessed = ? WHERE key = ?",
+                (time.time(), key),
+            )
+        return zlib.decompress(row[0])
+
+    def put(self, key: str, value: bytes) -> None:
+        """Store `value` under `key`, then evict the least recently used
+        entries until the cache fits in `max_bytes` again."""
+        blob = zlib.compress(value)
+        db = self._connection()
+        with db:
+            db.execute(
+                "INSERT INTO entries VALUES (?, ?, ?, ?) ON CONFLICT (key) "
+                "DO UPDATE SET value = excluded.value, size = excluded.size, "
+                "accessed = excluded.accessed",
+                (key, blob, len(blob), time.time()),
+            )
+            while self.size(db) > self.max_bytes:
+                db.execute(
+                    "DELETE FROM entries WHERE key IN "
+                    "(SELECT key FROM entries ORDER BY accessed LIMIT 1)"
+                )
+
+    def size(self, db: sqlite3.Connection | None = None) -> int:
+        """Return the compressed size of the entries, in bytes."""
+        db = db or self._connection()
+        (size,) = db.execute("SELECT bytes FROM usage").fetchone()
+        return int(size)
+
+    def __len__(self) -> int:
+        db = self._connection()
+        (count,) = db.execute("SELECT count(*) FROM entries").fetchone()
+        return int(count)
+
+    def clear(self) -> None:
+        with self._connection() as db:
+            db.execute("DELETE FROM entries")
+
+    def close(self) -> None:
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
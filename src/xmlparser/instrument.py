@@ -0,0 +1,292 @@
+"""Opt-in timing of the stages of the pipeline.
+
+The main functions of `xmlparser.xmlparser` are marked as stages. While
+instrumentation is off, which is the default, a stage costs one extra function
+call. Inside `instrument`, every call of a stage is timed and handed to the
+sinks as a `Record`::
+
+    with instrument() as stats:
+        chunks = list(get_chunks(parse_file(path)))
+    print(stats.report())
+
+Stages nest: the time of `get_chunks` includes that of `get_segments`,
+`transform_tree` and `build_chunk`. Instrumentation applies to the thread or
+asyncio task that entered `instrument`, and to the code it runs in a copy of
+its context, such as the workers of `run_batch` in thread mode; overlapping
+blocks in other threads or tasks do not see each other's sinks.
+"""
+
+import contextlib
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Protocol, TypeVar
+
+from lxml.etree import Element, _Element, _ElementTree
+
+if TYPE_CHECKING:
+    import logging
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+@dataclass
+class Record:
+    """Data class for one call of a stage."""
+
+    stage: str
+    seconds: float
+    bytes_in: int | None = 0
+    bytes_out: int = 0
+    elements: int = 0
+
+
+@dataclass
+class StageStats:
+    """Data class for the totals of a stage over all its calls."""
+
+    calls: int = 0
+    seconds: float = 0.0
+    bytes_in: int | None = None
+    bytes_out: int = 0
+    elements: int = 0
+
+    def add(self, record: Record) -> None:
+        self.calls += 1
+        self.seconds += record.seconds
+        if record.bytes_in is not None:
+            self.bytes_in = (self.bytes_in or 0) + record.bytes_in
+        self.bytes_out += record.bytes_out
+        self.elements += record.elements
+
+
+class Sink(Protocol):
+    def record(self, record: Record) -> None: ...
+
+
+class MemorySink:
+    """Sink adding up the records of each stage."""
+
+    def __init__(self) -> None:
+        self.stages: dict[str, StageStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, record: Record) -> None:
+        with self._lock:
+            stats = self.stages.get(record.stage)
+            if stats is None:
+                stats = self.stages[record.stage] = StageStats()
+            stats.add(record)
+
+    def report(self) -> str:
+        lines = [
+            f"{'stage':<18} {'calls':>7} {'seconds':>10} "
+            f"{'bytes in':>12} {'bytes out':>12} {'elements':>10}"
+        ]
+        for name, stats in sorted(
+            self.stages.items(), key=lambda item: -item[1].seconds
+        ):
+            bytes_in = "-" if stats.bytes_in is None else stats.bytes_in
+            lines.append(
+                f"{name:<18} {stats.calls:>7} {stats.seconds:>10.4f} "
+                f"{bytes_in:>12} {stats.bytes_out:>12} "
+                f"{stats.elements:>10}"
+            )
+        return "\n".join(lines)
+
+
+class LoggingSink:
+    """Sink logging every record, by default to the debug level of the
+    ``xmlparser.instrument`` logger."""
+
+    def __init__(
+        self, logger: "logging.Logger | None" = None, level: int | None = None
+    ) -> None:
+        # logging is slow to import, and only needed here.
+        import logging
+
+        self.logger = logger or logging.getLogger(__name__)
+        self.level = logging.DEBUG if level is None else level
+
+    def record(self, record: Record) -> None:
+        self.logger.log(
+            self.level,
+            "%s: %.6f s, %s bytes in, %d bytes out, %d elements",
+            record.stage,
+            record.seconds,
+            "-" if record.bytes_in is None else record.bytes_in,
+            record.bytes_out,
+            record.elements,
+        )
+
+
+class PrometheusSink(MemorySink):
+    """Sink writing the totals of each stage to `path` when it is closed.
+
+    The file is in the Prometheus text format, as read by the textfile
+    collector of the node exporter, and is replaced atomically.
+    """
+
+    metrics = {
+        "calls": "Number of calls of the stage.",
+        "seconds": "Wall time spent in the stage.",
+        "bytes_in": "Size of the markup read by the stage.",
+        "bytes_out": "Size of the markup produced by the stage.",
+        "elements": "Number of elements produced by the stage.",
+    }
+
+    def __init__(
+        self, path: str | os.PathLike[str], prefix: str = "xmlparser_stage"
+    ) -> None:
+        super().__init__()
+        self.path = path
+        self.prefix = prefix
+
+    def close(self) -> None:
+        lines = []
+        with self._lock:
+            for metric, description in self.metrics.items():
+                name = f"{self.prefix}_{metric}_total"
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} counter")
+                for stage, stats in sorted(self.stages.items()):
+                    value = getattr(stats, metric)
+                    if value is None:
+                        continue
+                    lines.append(f'{name}{{stage="{stage}"}} {value}')
+
+        temporary = f"{os.fspath(self.path)}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(temporary, self.path)
+
+
+_sinks: contextvars.ContextVar[tuple[Sink, ...]] = contextvars.ContextVar(
+    "sinks", default=()
+)
+
+
+@contextlib.contextmanager
+def instrument(*sinks: Sink) -> Iterator[Any]:
+    """Record the calls of every stage in `sinks` within the block.
+
+    Yields the first sink, a new `MemorySink` if none is given. Sinks with a
+    ``close`` method are closed on the way out.
+    """
+    sinks = sinks or (MemorySink(),)
+    token = _sinks.set(_sinks.get() + sinks)
+    try:
+        yield sinks[0]
+    finally:
+        _sinks.reset(token)
+        for sink in sinks:
+            close = getattr(sink, "close", None)
+            if close is not None:
+                close()
+
+
+def emit(record: Record, sinks: tuple[Sink, ...]) -> None:
+    for sink in sinks:
+        sink.record(record)
+
+
+def markup_size(*args: Any, **kwargs: Any) -> int:
+    return sum(
+        len(arg)
+        for arg in (*args, *kwargs.values())
+        if isinstance(arg, (str, bytes, bytearray, memoryview))
+    )
+
+
+def stage(
+    name: str, input_size: Callable[..., int] | None = markup_size
+) -> Callable[[F], F]:
+    """Make the decorated function a stage called `name`.
+
+    The input size is the length of the string and bytes arguments, or the
+    result of calling `input_size` with the arguments. With `input_size` set
+    to None, no input size is recorded. The output is measured by
+    `output_size`. Iterators are timed as they are consumed, and recorded
+    once exhausted or closed.
+    """
+
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            sinks = _sinks.get()
+            if not sinks:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            seconds = time.perf_counter() - start
+
+            size_in = None
+            if input_size is not None:
+                size_in = input_size(*args, **kwargs)
+            if isinstance(result, Iterator):
+                return timed_iterator(name, result, seconds, size_in, sinks)
+
+            emit(Record(name, seconds, size_in, *output_size(result)), sinks)
+            return result
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+def timed_iterator(
+    name: str,
+    items: Iterator[Any],
+    seconds: float,
+    size_in: int | None,
+    sinks: tuple[Sink, ...],
+) -> Iterator[Any]:
+    size_out = count = 0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                seconds += time.perf_counter() - start
+            size, _ = output_size(item)
+            size_out += size
+            count += 1
+            yield item
+    finally:
+        emit(Record(name, seconds, size_in, size_out, count), sinks)
+
+
+def file_size(file: Any, *args: Any, **kwargs: Any) -> int:
+    """Return the size of `file` on disk or in memory, or 0 for file
+    objects."""
+    if isinstance(file, (str, os.PathLike)):
+        try:
+            return os.path.getsize(file)
+        except OSError:
+            return 0
+    if hasattr(file, "__len__"):
+        return len(file)
+    return 0
+
+
+def output_size(result: Any) -> tuple[int, int]:
+    """Return the size in characters and in elements of `result`."""
+    match result:
+        case str() | bytes() | bytearray() | memoryview():
+            return len(result), 0
+        case _Element() | _ElementTree():
+            return 0, sum(1 for _ in result.iter(Element))
+        case object(content=str() as content):
+            return len(content), 0
+        case list():
+            return 0, len(result)
+        case _:
+            return 0, 0
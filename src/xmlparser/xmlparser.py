@@ -1,55 +1,115 @@
 """Module providing tools for the manipulation of XML articles."""
 
-import importlib
+import bisect
+import contextlib
+import functools
+import gzip
+import hashlib
+import io
 import itertools
+import mmap
 import os
 import pathlib
 import re
-from collections.abc import Iterator, Sequence
-from copy import deepcopy
+import threading
+from array import array
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass
-from typing import NamedTuple, TypeGuard
+from typing import IO, TYPE_CHECKING, NamedTuple, TypeGuard, overload
 
 from lxml.etree import (
     XSLT,
     Element,
+    ElementTree,
     QName,
     XMLSyntaxError,
+    XPath,
     XPathEvaluator,
-    _Comment,
     _Element,
     _ElementTree,
-    _ProcessingInstruction,
     cleanup_namespaces,
     fromstring,
+    iterparse,
     iterwalk,
     parse,
     register_namespace,
     tostring,
 )
-from nltk import RegexpTokenizer
 
-XSLDIR = importlib.resources.files("xmlparser.stylesheets")
+from .instrument import file_size, stage
 
-xml_char_tokenizer = RegexpTokenizer(r"<[\w/][^<>]*/?>|.")
+if TYPE_CHECKING:
+    import numpy as np
+    import pyarrow as pa
+
+# importlib.resources is slow to import; the stylesheets ship as plain files.
+XSLDIR = pathlib.Path(__file__).parent / "stylesheets"
+COMPRESSION_MAGIC = {
+    b"\x1f\x8b": "gzip",
+    b"BZh": "bz2",
+    b"\xfd7zXZ\x00": "xz",
+}
+
+xml_char_regex = re.compile(r"<[\w/][^<>]*/?>|.", re.DOTALL)
 open_tag = r"<\w[^<>]*>"
 closed_tag = r"</[^<>]*>"
 
 tag_pattern = open_tag + "|" + closed_tag
-tag_tokenizer = RegexpTokenizer(tag_pattern)
-text_tokenizer = RegexpTokenizer(tag_pattern, gaps=True)
+tag_regex = re.compile(tag_pattern)
+tag_bytes_regex = re.compile(tag_pattern.encode())
+tag_char_regex = re.compile(rf"({open_tag})|({closed_tag})|(.)")
+markup_regex = re.compile(rf"{tag_pattern}|[^<>]+")
+
+invalid_attrib_chars = r"\"'<>=\x00-\x1f\x7f-\x9f"
+attrib_regex = re.compile(
+    rf"([^ {invalid_attrib_chars}]+)"  # Name
+    rf"=[\"\']([^{invalid_attrib_chars}]+)[\"\']"  # Quoted value
+)
+
+# https://www.rfc-editor.org/rfc/rfc3986#appendix-B
+curie_regex = re.compile(
+    r"([a-zA-Z_][a-zA-Z_\-\.\d]*: ?"  # Prefix
+    r"[^:/?#]+:"  # Scheme, ex. http:
+    r"(?://[^/?# ]+)?"  # Authority (optional)
+    r"[^?# ]*"  # Path
+    r"(?:\?(?:[^# ]*))?"  # Query (optional)
+    r"(?:#(?:\S*))?)"  # Fragment (optional)
+)
 
+pmid_xpath = XPath("//*[name()='article-id'][@pub-id-type='pmid'][1]")
+doi_xpath = XPath("//*[name()='article-id'][@pub-id-type='doi'][1]")
+metadata_xpath = XPath("//*[name()='journal-meta' or name()='article-meta']")
 
-@dataclass
+chunk_tag_regex = re.compile("</?chunk>")
+METADATA_END = "</article-meta>"
+
+# Path, modification time and size of a stylesheet file.
+StylesheetKey = tuple[pathlib.Path, int, int]
+
+# Prefixes for the namespaces of PMC articles, registered once and for all.
+NAMESPACES = {
+    "ns": "https://dtd.nlm.nih.gov/ns/archiving/2.3/",
+    "xsi": "http://www.w3.org/2001/XMLSchema-instance",
+    "mml": "http://www.w3.org/1998/Math/MathML",
+    "xlink": "http://www.w3.org/1999/xlink",
+}
+for prefix, uri in NAMESPACES.items():
+    register_namespace(prefix, uri)
+
+
+@dataclass(slots=True)
 class TextDescription:
     """Data class for article metadata."""
 
     pmid: int
     doi: str | None
     metadata: str
+    pmcid: str | None = None
+    title: str | None = None
+    journal: str | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class TextChunk:
     """Data class for chunks of text from research articles."""
 
@@ -57,6 +117,90 @@ class TextChunk:
     pos: int
 
 
+class ChunkBatch:
+    """Columnar batch of chunks.
+
+    The contents are stored UTF-8 encoded, back to back in `data`, the
+    content of the i-th chunk being ``data[offsets[i]:offsets[i + 1]]``. This
+    is the layout of an Arrow ``large_string`` array, so that the batch can be
+    handed over to Arrow or NumPy without copying::
+
+        batch = ChunkBatch(get_chunks(tree))
+        table = batch.to_arrow()
+
+    While such a view is alive, the batch cannot grow.
+    """
+
+    __slots__ = ("data", "offsets", "pos")
+
+    def __init__(self, chunks: Iterable[TextChunk] = ()) -> None:
+        self.data = bytearray()
+        self.offsets = array("q", [0])
+        self.pos = array("q")
+        self.extend(chunks)
+
+    def append(self, chunk: TextChunk) -> None:
+        self.data += chunk.content.encode()
+        self.offsets.append(len(self.data))
+        self.pos.append(chunk.pos)
+
+    def extend(self, chunks: Iterable[TextChunk]) -> None:
+        for chunk in chunks:
+            self.append(chunk)
+
+    def __len__(self) -> int:
+        return len(self.pos)
+
+    def __getitem__(self, i: int) -> TextChunk:
+        i = range(len(self))[i]
+        start, end = self.offsets[i], self.offsets[i + 1]
+        content = self.data[start:end].decode()
+        return TextChunk(content=content, pos=self.pos[i])
+
+    def __iter__(self) -> Iterator[TextChunk]:
+        return (self[i] for i in range(len(self)))
+
+    def to_numpy(self) -> tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+        """Return views of `data` as ``uint8``, and of `offsets` and `pos`
+        as ``int64`` NumPy arrays.
+
+        :raises ImportError: NumPy is not installed.
+        """
+        try:
+            import numpy as np
+        except ImportError as e:
+            e.add_note("NumPy arrays require numpy (pip install numpy)")
+            raise
+
+        return (
+            np.frombuffer(self.data, dtype=np.uint8),
+            np.frombuffer(self.offsets, dtype=np.int64),
+            np.frombuffer(self.pos, dtype=np.int64),
+        )
+
+    def to_arrow(self) -> "pa.Table":
+        """Return a table with a ``content`` and a ``pos`` column over the
+        buffers of the batch.
+
+        :raises ImportError: pyarrow is not installed.
+        """
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            e.add_note("Arrow output requires pyarrow (pip install pyarrow)")
+            raise
+
+        content = pa.Array.from_buffers(
+            pa.large_string(),
+            len(self),
+            [None, pa.py_buffer(self.offsets), pa.py_buffer(self.data)],
+        )
+        pos = pa.Array.from_buffers(
+            pa.int64(), len(self), [None, pa.py_buffer(self.pos)]
+        )
+        return pa.table({"content": content, "pos": pos})
+
+
 def concat(*strings: str | None, sep: str = "") -> str:
     """Concatenate a sequence of possibly null strings."""
 
@@ -66,35 +210,257 @@ def concat(*strings: str | None, sep: str = "") -> str:
     return sep.join(filter(is_not_none, strings))
 
 
-def parse_file(file: str) -> _ElementTree:
+@stage("parse_file", input_size=file_size)
+def parse_file(
+    file: "ArticleSource", header_only: bool = False
+) -> _ElementTree:
+    """Parse the article in `file`.
+
+    :param file: Path, binary file object, such as a tarball member, or
+        buffer, such as an mmap. Compressed input is decompressed on the fly,
+        see `open_article`.
+    :param header_only: Stop parsing as soon as the article metadata has been
+        read. The tree then holds the document up to ``</article-meta>``,
+        which is all `get_text` needs.
+    """
     try:
-        tree: _ElementTree = parse(file)
-        return tree
+        with open_article(file) as stream:
+            if header_only:
+                return parse_front(stream)
+            tree: _ElementTree = parse(stream)
+            return tree
     except XMLSyntaxError:
-        print(f"{file} could not be parsed")
+        print(f"{describe(file)} could not be parsed")
         raise
 
 
-def tree_as_string(tree: _ElementTree | _Element) -> str:
-    namespaces = {
-        "ns": "https://dtd.nlm.nih.gov/ns/archiving/2.3/",
-        "xsi": "http://www.w3.org/2001/XMLSchema-instance",
-        "mml": "http://www.w3.org/1998/Math/MathML",
-        "xlink": "http://www.w3.org/1999/xlink",
-    }
+Buffer = bytes | bytearray | memoryview | mmap.mmap
+ArticleSource = str | os.PathLike[str] | IO[bytes] | Buffer
+
+
+def describe(file: ArticleSource) -> str:
+    """Name `file` in messages: by its path if it has one, otherwise by its
+    type, since buffers can hold whole articles."""
+    if isinstance(file, (str, os.PathLike)):
+        return os.fspath(file)
+    name = getattr(file, "name", None)
+    if isinstance(name, str):
+        return name
+    return f"<{type(file).__name__}>"
+
+
+@contextlib.contextmanager
+def open_article(file: ArticleSource) -> Iterator[IO[bytes]]:
+    """Open `file` for reading, decompressing it if it is compressed with
+    gzip, bzip2 or xz.
+
+    Buffers are read in place rather than copied, and compressed input is
+    decompressed as it is read.
+    """
+    with contextlib.ExitStack() as stack:
+        if isinstance(file, (str, os.PathLike)):
+            file = stack.enter_context(open(file, "rb"))
+        elif isinstance(file, (bytes, bytearray, memoryview, mmap.mmap)):
+            file = stack.enter_context(io.BufferedReader(BufferReader(file)))
+
+        match compression(file):
+            case "gzip":
+                file = stack.enter_context(gzip.GzipFile(fileobj=file))
+            case "bz2":
+                import bz2
+
+                file = stack.enter_context(bz2.BZ2File(file))
+            case "xz":
+                import lzma
+
+                file = stack.enter_context(lzma.LZMAFile(file))
+
+        yield file
+
+
+def compression(file: IO[bytes]) -> str | None:
+    """Tell how `file` is compressed from its first bytes, if it can be
+    read ahead."""
+    if hasattr(file, "peek"):
+        magic = file.peek(6)[:6]
+    elif file.seekable():
+        position = file.tell()
+        magic = file.read(6)
+        file.seek(position)
+    else:
+        return None
+
+    for prefix, name in COMPRESSION_MAGIC.items():
+        if magic.startswith(prefix):
+            return name
+    return None
 
-    for key, value in namespaces.items():
-        register_namespace(key, value)
 
-    return tostring(tree, method="c14n2").decode("utf-8")
+class BufferReader(io.RawIOBase):
+    """Binary file object reading from a buffer, such as an mmap, in place."""
+
+    def __init__(self, buffer: Buffer) -> None:
+        self._view = memoryview(buffer).cast("B")
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(  # type: ignore[override]
+        self, b: bytearray | memoryview
+    ) -> int:
+        size = min(len(b), len(self._view) - self._position)
+        b[:size] = self._view[self._position : self._position + size]
+        self._position += size
+        return size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        start = {io.SEEK_SET: 0, io.SEEK_CUR: self._position}
+        self._position = start.get(whence, len(self._view)) + offset
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+    def close(self) -> None:
+        self._view.release()
+        super().close()
+
+
+def parse_front(file: IO[bytes]) -> _ElementTree:
+    """Parse `file` up to the end of its article metadata."""
+    context = iterparse(file, events=("end",))
+    for _, elem in context:
+        if (
+            isinstance(elem.tag, str)
+            and QName(elem).localname == "article-meta"
+        ):
+            return elem.getroottree()
+
+    return context.root.getroottree()
+
+
+def tar_members(
+    path: str | os.PathLike[str], suffixes: tuple[str, ...] = (".xml", ".nxml")
+) -> Iterator[tuple[str, IO[bytes]]]:
+    """Yield the articles in the tarball at `path` without unpacking it.
+
+    Each member has to be read before moving on to the next one, since the
+    tarball is read as a stream.
+    """
+    import tarfile  # Only needed here, and slow to import.
+
+    with tarfile.open(path, mode="r|*") as tar:
+        for member in tar:
+            if member.isfile() and member.name.endswith(suffixes):
+                stream = tar.extractfile(member)
+                if stream is not None:
+                    yield member.name, stream
+
+
+@stage("tree_as_string")
+def tree_as_string(
+    tree: _ElementTree | _Element, canonical: bool = True
+) -> str:
+    """Serialise `tree`.
+
+    :param canonical: Use Canonical XML 2.0, which is stable across
+        serialisations but an order of magnitude slower than plain output.
+    """
+    if canonical:
+        return tostring(tree, method="c14n2").decode("utf-8")
+
+    return tostring(tree, encoding="unicode")
+
+
+@stage("write_tree", input_size=None)
+def write_tree(
+    tree: _ElementTree | _Element,
+    file: str | os.PathLike[str] | IO[bytes],
+    canonical: bool = True,
+) -> None:
+    """Serialise `tree` like `tree_as_string`, straight into `file`.
+
+    :param file: Path or binary file object.
+    """
+    if isinstance(tree, _Element):
+        tree = ElementTree(tree)
+
+    if canonical:
+        tree.write(file, method="c14n2")
+    else:
+        tree.write(file, encoding="utf-8")
 
 
 def get_text(tree: _ElementTree) -> TextDescription:
-    pmid = get_pmid(tree)
-    doi = get_doi(tree)
-    meta = get_metadata(tree)
+    front = FrontMatter()
+    for _, elem in iterwalk(tree, events=("end",)):
+        if front.feed(elem):
+            break
+
+    return front.description()
 
-    return TextDescription(pmid=pmid, doi=doi, metadata=meta)
+
+class FrontMatter:
+    """Collect the description of an article in a single pass.
+
+    Elements are fed in the order of their ``end`` events, which can come from
+    `iterwalk` over a parsed tree as well as from `iterparse` over the raw
+    document. `feed` returns True once the article metadata is complete, so
+    that the rest of the document does not need to be visited.
+    """
+
+    def __init__(self) -> None:
+        self.article_ids: dict[str, str | None] = {}
+        self.title: str | None = None
+        self.journal: str | None = None
+        self.blocks: list[str] = []
+
+    def feed(self, elem: _Element) -> bool:
+        if not isinstance(elem.tag, str):
+            return False
+
+        name = QName(elem).localname
+
+        if name == "article-id":
+            self.article_ids.setdefault(elem.get("pub-id-type", ""), elem.text)
+        elif name == "article-title" and self.title is None:
+            parent = elem.getparent()
+            if parent is not None and QName(parent).localname == "title-group":
+                self.title = "".join(elem.itertext()).strip()
+        elif name == "journal-title" and self.journal is None:
+            self.journal = "".join(elem.itertext()).strip()
+        elif name in ("journal-meta", "article-meta"):
+            block = tostring(elem, encoding="unicode", with_tail=False)
+            self.blocks.append(block.strip())
+            return name == "article-meta"
+
+        return False
+
+    def description(self) -> TextDescription:
+        """Return the description collected so far.
+
+        :raises ValueError: No Pubmed ID was found.
+        """
+        pmid = self.article_ids.get("pmid")
+        if not pmid:
+            raise ValueError("Could not find a PMID.")
+
+        return TextDescription(
+            pmid=int(pmid),
+            doi=self.article_ids.get("doi") or None,
+            metadata="\n".join(self.blocks),
+            pmcid=(
+                self.article_ids.get("pmcid")
+                or self.article_ids.get("pmc")
+                or None
+            ),
+            title=self.title,
+            journal=self.journal,
+        )
 
 
 def get_pmid(tree: _ElementTree) -> int:
@@ -104,8 +470,7 @@ def get_pmid(tree: _ElementTree) -> int:
     :raises ValueError: Raise an exception when a Pubmed ID cannot be found.
     :return: Pubmed ID
     """
-    pmid_path = "//*[name()='article-id'][@pub-id-type='pmid'][1]"
-    pmid = tree.xpath(pmid_path)
+    pmid = pmid_xpath(tree)
 
     if isinstance(pmid, list) and isinstance(pmid[0], _Element):
         if pmid[0].text:
@@ -120,8 +485,7 @@ def get_doi(tree: _ElementTree) -> str | None:
     :param tree: ElementTree to be searched.
     :return: DOI, if available, otherwise None.
     """
-    doi_path = "//*[name()='article-id'][@pub-id-type='doi'][1]"
-    doi = tree.xpath(doi_path)
+    doi = doi_xpath(tree)
 
     if isinstance(doi, list) and isinstance(doi[0], _Element):
         if doi[0].text:
@@ -130,6 +494,7 @@ def get_doi(tree: _ElementTree) -> str | None:
     return None
 
 
+@stage("get_segments")
 def get_segments(tree: _ElementTree) -> list[_Element]:
     tree = transform_tree(tree)
     pathfinder: XPathEvaluator = XPathEvaluator(tree)
@@ -147,113 +512,407 @@ def get_segments(tree: _ElementTree) -> list[_Element]:
 
 
 def get_metadata(tree: _ElementTree) -> str:
-    pathfinder = XPathEvaluator(tree)
-    metadata = pathfinder("//*[name()='journal-meta' or name()='article-meta']")
+    metadata = metadata_xpath(tree)
     return "\n".join(
         tostring(block, encoding="unicode").strip() for block in metadata
     )
 
 
+@stage("clean_namespaces")
 def clean_namespaces(elem: _Element | _ElementTree) -> _Element | _ElementTree:
-    for subelem in elem.getiterator():
-        if not (
-            isinstance(subelem, _Comment)
-            or isinstance(subelem, _ProcessingInstruction)
-        ):
-            try:
-                subelem.tag = QName(subelem).localname
-            except ValueError as e:
-                e.add_note(tostring(subelem).decode())
-                raise
+    """Strip the namespaces from the tags in `elem`, in place.
+
+    Iterating over `Element` skips comments and processing instructions in
+    lxml, and only the tags that are actually namespaced are rewritten, so
+    cleaning a tree that is clean already costs little more than a scan.
+    """
+    for subelem in elem.iter(Element):
+        tag = subelem.tag
+        if tag[0] == "{":
+            subelem.tag = localname(tag)
 
     cleanup_namespaces(elem)
 
     return elem
 
 
+@functools.lru_cache(maxsize=1024)
+def localname(tag: str) -> str:
+    return tag.rpartition("}")[2]
+
+
 def segment_to_string(segment: _Element) -> str:
+    # A namespaced tag or a namespace declaration in the segment serialises
+    # with an xmlns attribute. Without one, there is nothing to clean, and the
+    # serialisation is the result.
+    string = tostring(segment, method="xml", encoding="unicode")
+    if "xmlns" not in string:
+        return string
+
     segment = clean_namespaces(segment)
 
     return tostring(segment, method="xml", encoding="unicode")
 
 
-def build_chunk(content: str, pos: int) -> dict[str, int | str]:
-    prettified = tostring(
-        clean_namespaces(fromstring(f"<chunk-body>{content}</chunk-body>")),
-        pretty_print=True,
-        encoding="unicode",
-    )
-    return {"content": prettified, "pos": pos}
+class ChunkContent:
+    """Segments of a chunk being assembled.
+
+    Segments are kept along with their serialisation, and the total length of
+    the serialised segments is kept up to date, so that growing a chunk never
+    copies the content gathered so far.
+    """
+
+    __slots__ = ("segments", "strings", "length")
+
+    def __init__(self) -> None:
+        self.segments: list[_Element] = []
+        self.strings: list[str] = []
+        self.length = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.length)
+
+    def add(self, segment: _Element, string: str) -> None:
+        self.segments.append(segment)
+        self.strings.append(string)
+        self.length += len(string)
+
+    def extend(self, other: "ChunkContent") -> None:
+        self.segments.extend(other.segments)
+        self.strings.extend(other.strings)
+        self.length += other.length
+
 
+@stage("build_chunk")
+def build_chunk(
+    content: ChunkContent, pos: int, pretty_print: bool = True
+) -> TextChunk:
+    """Wrap the segments in `content` in a ``chunk-body`` element.
 
+    Segments are expected to be cleaned already. Without pretty-printing, the
+    chunk is put together from their serialisations alone.
+    """
+    if pretty_print:
+        body = Element("chunk-body")
+        body.extend(content.segments)
+        string = tostring(body, pretty_print=True, encoding="unicode")
+    else:
+        string = f"<chunk-body>{''.join(content.strings)}</chunk-body>"
+
+    return TextChunk(content=string, pos=pos)
+
+
+@stage("get_chunks")
 def get_chunks(
-    tree: _ElementTree, minlen: int = 4000, maxlen: int = 6000
+    tree: _ElementTree,
+    minlen: int = 4000,
+    maxlen: int = 6000,
+    pretty_print: bool = True,
+) -> Iterator[TextChunk]:
+    """Split the article in `tree` into chunks of segments.
+
+    :param pretty_print: Indent the content of the chunks. Turn it off when
+        the chunks are fed to a tokenizer rather than read.
+    """
+    return pack_chunks(
+        iter(get_segments(tree)),
+        minlen=minlen,
+        maxlen=maxlen,
+        pretty_print=pretty_print,
+    )
+
+
+def stream_chunks(
+    source: str | os.PathLike[str] | IO[bytes],
+    minlen: int = 4000,
+    maxlen: int = 6000,
+    style: str = "jats",
+    pretty_print: bool = True,
 ) -> Iterator[TextChunk]:
-    segments: Iterator[_Element] = iter(get_segments(tree))
+    """Chunk the article in `source` while it is being parsed.
+
+    Produces the same chunks as `get_chunks`, but only keeps the segment
+    being read in memory, rather than the whole article and its
+    transformation.
+
+    :param source: Path or binary file object with the article XML.
+    """
+    return pack_chunks(
+        stream_segments(source, style=style),
+        minlen=minlen,
+        maxlen=maxlen,
+        pretty_print=pretty_print,
+    )
+
+
+def stream_segments(
+    source: str | os.PathLike[str] | IO[bytes], style: str = "jats"
+) -> Iterator[_Element]:
+    """Yield the segments of the article in `source` as they are parsed.
 
+    Segments are selected like in `get_segments`, but are transformed one at
+    a time and come out in document order. Everything outside the segment
+    being read is discarded as soon as it has been parsed.
+    """
+    xslt_transform = stylesheets.get(style)
+    open_segments = 0
+    pending: _Element | None = None
+
+    for event, elem in iterparse(source, events=("start", "end")):
+        # The tail of a segment is complete once the next tag is reached.
+        if pending is not None:
+            segment = xslt_transform(pending).getroot()
+            segment.tail = pending.tail
+            yield segment
+            discard(pending)
+            pending = None
+
+        if event == "start":
+            if is_segment(elem):
+                open_segments += 1
+        elif is_segment(elem):
+            open_segments -= 1
+            pending = elem
+        elif not open_segments:
+            discard(elem)
+
+    if pending is not None:
+        segment = xslt_transform(pending).getroot()
+        segment.tail = pending.tail
+        yield segment
+
+
+def is_segment(elem: _Element) -> bool:
+    """Tell whether `elem` would be picked as a segment by `get_segments`."""
+    if elem.get("class") == "abstract":
+        return True
+
+    parent = elem.getparent()
+    if parent is None or parent.get("class") != "article-body":
+        return False
+
+    name = QName(elem).localname
+    return name in "h2h3h4h5h6" or name in ("p", "table-wrap", "fig")
+
+
+def discard(elem: _Element) -> None:
+    """Free `elem` and its preceding siblings once they have been parsed."""
+    elem.clear(keep_tail=True)
+    parent = elem.getparent()
+    if parent is not None:
+        while elem.getprevious() is not None:
+            del parent[0]
+
+
+def pack_chunks(
+    segments: Iterator[_Element],
+    minlen: int = 4000,
+    maxlen: int = 6000,
+    pretty_print: bool = True,
+) -> Iterator[TextChunk]:
+    """Pack `segments` into chunks, measured by the length of their markup.
+
+    The first segment makes up a chunk of its own. The following ones are
+    packed into chunks of up to `maxlen` characters, starting a new chunk
+    at a header once the current one is longer than `minlen`.
+    """
     pos = itertools.count()
-    yield build_chunk(content=segment_to_string(next(segments)), pos=next(pos))
+    first = next(segments, None)
+    if first is None:
+        return
+
+    content = ChunkContent()
+    content.add(first, segment_to_string(first))
+    yield build_chunk(content, next(pos), pretty_print)
 
-    content = ""
-    content_buffer = ""
+    content = ChunkContent()
+    content_buffer = ChunkContent()
 
     for seg in segments:
         segstring = segment_to_string(seg)
 
         if (
             seg.tag[-2:] in ("h1", "h2", "h3", "h4", "h5", "h6")
-            and len(content) > minlen
+            and content.length > minlen
         ):
-            content_buffer = concat(content_buffer, segstring)
-        elif not content_buffer and len(content) + len(segstring) <= maxlen:
-            content = concat(content, segstring)
+            content_buffer.add(seg, segstring)
+        elif not content_buffer and content.length + len(segstring) <= maxlen:
+            content.add(seg, segstring)
         else:
-            content_buffer = concat(content_buffer, segstring)
+            content_buffer.add(seg, segstring)
 
-        if len(content_buffer) >= minlen:
-            yield build_chunk(content=content, pos=next(pos))
-            content, content_buffer = content_buffer, ""
+        if content_buffer.length >= minlen:
+            yield build_chunk(content, next(pos), pretty_print)
+            content, content_buffer = content_buffer, ChunkContent()
 
-    content = concat(content, content_buffer)
+    content.extend(content_buffer)
 
     if content:
-        yield build_chunk(content=content, pos=next(pos))
+        yield build_chunk(content, next(pos), pretty_print)
+
+
+class StylesheetRegistry:
+    """Thread-safe registry of compiled XSLT stylesheets.
+
+    Stylesheets are read on first use and kept until the file they were read
+    from changes on disk. Each thread compiles its own copy, so that
+    concurrent transforms share no libxslt state, and repeated transforms
+    only pay for the transformation itself.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._paths: dict[str, pathlib.Path] = {}
+        self._sources: dict[str, tuple[StylesheetKey, str, bytes]] = {}
+        self._local = threading.local()
+
+    def register(self, style: str, path: str | os.PathLike[str]) -> None:
+        """Make the stylesheet at `path` available under the name `style`.
 
+        Registering a name again replaces the previous stylesheet.
+        """
+        path = pathlib.Path(path)
+        if not path.is_file():
+            raise FileNotFoundError(f"No stylesheet found at {path}")
 
+        with self._lock:
+            self._paths[style] = path
+            self._sources.pop(style, None)
+
+    def styles(self) -> list[str]:
+        return sorted(self._paths)
+
+    def get(self, style: str) -> XSLT:
+        """Return the stylesheet registered as `style`, compiled for the
+        current thread.
+
+        :raises KeyError: `style` has not been registered.
+        """
+        key, _, source = self._source(style)
+
+        compiled: dict[str, tuple[StylesheetKey, XSLT]]
+        compiled = self._local.__dict__.setdefault("compiled", {})
+        entry = compiled.get(style)
+        if entry is None or entry[0] != key:
+            xslt = XSLT(fromstring(source, base_url=str(key[0])))
+            entry = compiled[style] = (key, xslt)
+
+        return entry[1]
+
+    def digest(self, style: str) -> str:
+        """Return the SHA-256 digest of the source of stylesheet `style`."""
+        return self._source(style)[1]
+
+    def warm(self) -> None:
+        """Compile every registered stylesheet for the current thread ahead
+        of its first use."""
+        for style in self.styles():
+            self.get(style)
+
+    def _source(self, style: str) -> tuple[StylesheetKey, str, bytes]:
+        path = self._paths[style]
+        stat = path.stat()
+        key = (path, stat.st_mtime_ns, stat.st_size)
+
+        entry = self._sources.get(style)
+        if entry is not None and entry[0] == key:
+            return entry
+
+        with self._lock:
+            entry = self._sources.get(style)
+            if entry is None or entry[0] != key:
+                source = path.read_bytes()
+                entry = (key, hashlib.sha256(source).hexdigest(), source)
+                self._sources[style] = entry
+
+        return entry
+
+
+stylesheets = StylesheetRegistry()
+stylesheets.register("jats", XSLDIR / "jats.xsl")
+
+if os.environ.get("XMLPARSER_WARM_STYLESHEETS"):
+    stylesheets.warm()
+
+
+def register_stylesheet(style: str, path: str | os.PathLike[str]) -> None:
+    stylesheets.register(style, path)
+
+
+@stage("transform_tree")
 def transform_tree(
     tree: _ElementTree | _Element | str, style: str = "jats"
 ) -> _Element | _ElementTree:
     if isinstance(tree, str):
         tree = fromstring(tree)
-    stylesheet = {"jats": "jats.xsl"}[style]
-    path = XSLDIR / stylesheet
-    xslt_transform = XSLT(parse(path))
+    xslt_transform = stylesheets.get(style)
 
     return xslt_transform(tree)
 
 
-def transform_article(article_xml: str | bytes, style: str = "jats") -> str:
+def transform_article(
+    article_xml: str | bytes | ArticleSource, style: str = "jats"
+) -> bytes:
+    """Transform an article, given as markup or as anything `open_article`
+    reads, with the stylesheet registered as `style`.
+
+    Strings are taken to be markup; pass paths as `pathlib.Path`. Unclosed
+    ``<hr>`` tags are repaired while the article is read.
+    """
     if isinstance(article_xml, str):
         article_xml = article_xml.encode()
 
-    article_xml = close_tags(article_xml)
-
     try:
-        tree = fromstring(article_xml)
+        with open_article(article_xml) as stream:
+            tree = parse(io.BufferedReader(ClosingReader(stream)))
     except XMLSyntaxError as e:
-        e.add_note(str(article_xml))
+        if isinstance(article_xml, bytes):
+            e.add_note(str(close_tags(article_xml)))
         raise
     else:
         return tostring(transform_tree(tree, style=style))
 
 
 def close_tags(xml: str | bytes) -> bytes:
-    if isinstance(xml, bytes):
-        closed = re.sub("<hr>", "<hr/>", xml.decode()).encode()
-    else:
-        closed = re.sub("<hr>", "<hr/>", xml).encode()
+    if isinstance(xml, str):
+        xml = xml.encode()
+
+    return xml.replace(b"<hr>", b"<hr/>")
+
+
+class ClosingReader(io.RawIOBase):
+    """Binary file object closing the ``<hr>`` tags of `stream` as it is
+    read, like `close_tags`."""
+
+    def __init__(self, stream: IO[bytes], size: int = 2**16) -> None:
+        self._stream: IO[bytes] | None = stream
+        self._size = size
+        self._buffer = memoryview(b"")
+        self._carry = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(  # type: ignore[override]
+        self, b: bytearray | memoryview
+    ) -> int:
+        while not self._buffer and self._stream is not None:
+            data = self._carry + self._stream.read(max(len(b), self._size))
+            if len(data) == len(self._carry):
+                self._stream = None
+                self._buffer, self._carry = memoryview(data), b""
+                break
 
-    return closed
+            # Hold back the beginning of a tag split across two reads.
+            keep = next((n for n in (3, 2, 1) if data.endswith(b"<hr"[:n])), 0)
+            cut = len(data) - keep
+            self._buffer = memoryview(data[:cut].replace(b"<hr>", b"<hr/>"))
+            self._carry = data[cut:]
+
+        size = min(len(b), len(self._buffer))
+        b[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
 
 
 class Tag(NamedTuple):
@@ -261,52 +920,410 @@ class Tag(NamedTuple):
     start: int
 
 
-def remove_tags(xml: str) -> str:
-    return "".join(text_tokenizer.tokenize(xml))
+class Span(NamedTuple):
+    """Description of a span that is still open while annotating a text.
+
+    Only the description is carried from one text node to the next; the
+    element itself is created where the span is materialised.
+    """
+
+    tag: str
+    attrib: dict[str, str]
+
+    def element(self) -> _Element:
+        return Element(self.tag, self.attrib)
+
+
+@overload
+def remove_tags(xml: str) -> str: ...
+
 
+@overload
+def remove_tags(xml: bytes | memoryview) -> bytes: ...
 
-def tokenize_xml(xml: str) -> str:
-    return xml_char_tokenizer.tokenize(xml)
 
+def remove_tags(xml: str | bytes | memoryview) -> str | bytes:
+    """Strip the tags from `xml`, which can be text or a UTF-8 buffer."""
+    if isinstance(xml, str):
+        return tag_regex.sub("", xml)
+
+    return tag_bytes_regex.sub(b"", xml)
+
+
+def text_spans(xml: str | bytes | memoryview) -> array:
+    """Locate the text between the tags of `xml` without copying it.
+
+    The spans are returned flat, as ``[start, end, start, end, ...]``, in
+    characters for a `str` and in bytes for a buffer, so that
+    ``xml[start:end]`` is the text of each span. Joining the spans gives
+    ``remove_tags(xml)``.
+    """
+    regex = tag_regex if isinstance(xml, str) else tag_bytes_regex
+    spans = array("q")
+    start = 0
+
+    for match in regex.finditer(xml):
+        tag_start, tag_end = match.span()
+        if tag_start > start:
+            spans.extend((start, tag_start))
+        start = tag_end
+
+    end = len(xml) if isinstance(xml, str) else memoryview(xml).nbytes
+    if end > start:
+        spans.extend((start, end))
+
+    return spans
+
+
+def remove_tags_with_offsets(xml: str) -> tuple[str, "OffsetMap"]:
+    """Strip the tags from `xml`, and keep track of where the text came from.
+
+    :return: The plain text, and the `OffsetMap` from its offsets back to
+        offsets in `xml`.
+    """
+    offsets = OffsetMap(xml)
+    return tag_regex.sub("", xml), offsets
+
+
+class OffsetMap:
+    """Map offsets in the plain text of some markup back to the markup.
+
+    The plain text is made of runs of text uninterrupted by tags. The map
+    stores where each run starts in the plain text and in the markup, as two
+    int32 arrays, which can be shared with NumPy through
+    ``numpy.frombuffer(offsets.plain_starts, dtype=numpy.int32)``. An offset
+    is translated with a binary search over the runs.
+    """
+
+    __slots__ = ("plain_starts", "xml_starts", "length")
+
+    def __init__(self, xml: str | bytes | memoryview) -> None:
+        spans = text_spans(xml)
+        self.plain_starts = array("i")
+        self.xml_starts = array("i", spans[::2])
 
+        length = 0
+        for start, end in zip(self.xml_starts, spans[1::2]):
+            self.plain_starts.append(length)
+            length += end - start
+
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def to_xml(self, offset: int, end: bool = False) -> int:
+        """Translate `offset` in the plain text into an offset in the markup.
+
+        An offset that falls between two runs is ambiguous: it is the end of
+        the first run as well as the start of the second one. It is taken as
+        a start, unless `end` is set, so that ``xml[to_xml(start):to_xml(stop,
+        end=True)]`` leaves out any tag around the plain text `start:stop`.
+
+        :raises IndexError: `offset` is outside the plain text.
+        """
+        if not 0 <= offset <= self.length:
+            raise IndexError(f"Offset {offset} is outside the plain text")
+        if not self.plain_starts:
+            return 0
+
+        if end and offset:
+            run = bisect.bisect_left(self.plain_starts, offset) - 1
+        else:
+            run = bisect.bisect_right(self.plain_starts, offset) - 1
+
+        return self.xml_starts[run] + offset - self.plain_starts[run]
+
+    def span(self, start: int, stop: int) -> tuple[int, int]:
+        """Translate the plain text `start:stop` into a slice of the markup."""
+        return self.to_xml(start), self.to_xml(stop, end=start < stop)
+
+
+def tokenize_xml(xml: str) -> list[str]:
+    return xml_char_regex.findall(xml)
+
+
+@stage("reinsert_tags")
 def reinsert_tags(text: str, xml: _Element | _ElementTree | str) -> str:
     if isinstance(xml, str):
         xml = fromstring(xml).getroottree()
 
-    textit = chars(text)
-
-    open_spans: list[_Element] = []
-    original_elements = tuple(xml.iter())
-
-    for event, elem in iterwalk(xml, events=("start", "end")):
-        # check if elem wasn't added in a previous annotation step
-        if elem in original_elements:
-            elem = clean_namespaces(elem)
-            root = True if elem == xml.getroot() else False
-            if event == "start" and elem.text is not None:
-                segment = "".join(itertools.islice(textit, len(elem.text)))
-                elem, open_spans = annotate_text(
-                    elem, segment, open_spans, "text"
-                )
-                if root:
-                    xml._setroot(elem)
-            elif event == "end" and elem.tail is not None:
-                segment = "".join(itertools.islice(textit, len(elem.tail)))
-                elem, open_spans = annotate_text(
-                    elem, segment, open_spans, "tail"
-                )
-
-    xml = merge_children(promote_spans(xml))
+    alignment = TextAlignment(text)
+    offset = 0
+
+    open_spans: list[Span] = []
+    xml = clean_namespaces(xml)
+    root = xml.getroot()
+
+    # Take the walk before annotating, so that the spans inserted along the
+    # way are never visited.
+    events = list(iterwalk(xml, events=("start", "end")))
+
+    for event, elem in events:
+        if event == "start" and elem.text is not None:
+            segment = alignment.span(offset, offset + len(elem.text))
+            offset += len(elem.text)
+            elem, open_spans = annotate_text(elem, segment, open_spans, "text")
+            if elem is root:
+                xml._setroot(elem)
+        elif event == "end" and elem.tail is not None:
+            segment = alignment.span(offset, offset + len(elem.tail))
+            offset += len(elem.tail)
+            elem, open_spans = annotate_text(elem, segment, open_spans, "tail")
+
+    xml = normalize_spans(xml)
 
     return tostring(xml, method="html", encoding="unicode")
 
 
+def annotate_spans(
+    xml: _Element | _ElementTree,
+    spans: Iterable[tuple[int, int, dict[str, str]]],
+) -> _Element | _ElementTree:
+    """Wrap the plain text ranges in `spans` in ``span`` elements, in place.
+
+    The result is the tree that `reinsert_tags` builds from the plain text of
+    `xml` annotated with `spans`, provided that `reinsert_tags` leaves `xml`
+    itself unchanged. Only the text nodes that the spans touch are
+    rewritten, and only the elements around them are normalised, so the cost
+    does not depend on the rest of the document.
+
+    :param spans: ``(start, end, attrib)`` triples, in offsets of the plain
+        text. Spans can be nested, but cannot overlap otherwise.
+    :raises ValueError: A span is empty, out of the text or overlaps another.
+    """
+    opening, closing = span_boundaries(spans)
+    if not closing:
+        return xml
+
+    boundaries = sorted(opening.keys() | closing.keys())
+    inserted: list[_Element] = []
+    skip: set[_Element] = set()
+    subtrees: dict[_Element, None] = {}
+    parents: dict[_Element, None] = {}
+    open_spans: list[Span] = []
+    offset = 0
+    upcoming = 0
+
+    walk = iterwalk(xml, events=("start", "end"))
+    for event, elem in walk:
+        if elem in skip:
+            if event == "start":
+                walk.skip_subtree()
+            continue
+        if offset > boundaries[-1] and not open_spans:
+            break
+
+        position = "text" if event == "start" else "tail"
+        text = elem.text if event == "start" else elem.tail
+        if text is None:
+            continue
+
+        start, offset = offset, offset + len(text)
+        while upcoming < len(boundaries) - 1 and boundaries[upcoming] < start:
+            upcoming += 1
+        if boundaries[upcoming] > offset and not open_spans:
+            continue
+
+        tokens = slot_tokens(text, start, boundaries, opening, closing)
+        if open_spans and not tokens:
+            tokens = [text]
+        if tokens:
+            first = len(inserted)
+            _, open_spans = insert_tokens(
+                elem, tokens, open_spans, position, inserted
+            )
+            skip.update(inserted[first:])
+
+            # A text node only changes its own subtree, and possibly the
+            # wrappers above it. A tail changes the children of the parent,
+            # which only need to be merged again.
+            parent = elem.getparent()
+            if event == "start" or parent is None:
+                subtrees[unwrap(elem)] = None
+            else:
+                subtrees[elem] = None
+                for new in inserted[first:]:
+                    if new.getparent() is parent:
+                        subtrees[new] = None
+                parents[parent] = None
+
+    if offset < boundaries[-1]:
+        raise ValueError(
+            f"Span end {boundaries[-1]} is past the end of the text"
+        )
+
+    normalize_regions(subtrees, parents)
+
+    return xml
+
+
+def span_boundaries(
+    spans: Iterable[tuple[int, int, dict[str, str]]],
+) -> tuple[dict[int, list[Span]], dict[int, int]]:
+    """Index `spans` by the offsets where they open and close.
+
+    Spans opening at the same offset are ordered from the outermost in.
+    """
+    ordered = sorted(
+        enumerate(spans), key=lambda item: (item[1][0], -item[1][1], item[0])
+    )
+    opening: dict[int, list[Span]] = {}
+    closing: dict[int, int] = {}
+    ends: list[int] = []
+
+    for _, (start, end, attrib) in ordered:
+        if not 0 <= start < end:
+            raise ValueError(f"Invalid span {start}:{end}")
+        while ends and ends[-1] <= start:
+            ends.pop()
+        if ends and ends[-1] < end:
+            raise ValueError(
+                f"Span {start}:{end} overlaps span ending at {ends[-1]}"
+            )
+        ends.append(end)
+        opening.setdefault(start, []).append(Span("span", dict(attrib)))
+        closing[end] = closing.get(end, 0) + 1
+
+    return opening, closing
+
+
+def slot_tokens(
+    text: str,
+    start: int,
+    boundaries: list[int],
+    opening: dict[int, list[Span]],
+    closing: dict[int, int],
+) -> list[Span | str | None]:
+    """Return the tokens of the annotated `text`, which starts at `start`.
+
+    Tags are attached to the characters of the text like in `TextAlignment`:
+    opening tags to the next character, and a single closing tag to the
+    previous one. Further closing tags at the same offset go with the next
+    character, even if that is in the next text node.
+
+    :param boundaries: Sorted offsets where spans open or close.
+    :return: The tokens, or an empty list if no tag goes with the text.
+    """
+    stop = start + len(text)
+    tokens: list[Span | str | None] = []
+    tagged = False
+    cursor = start
+
+    first = bisect.bisect_left(boundaries, start)
+    last = bisect.bisect_right(boundaries, stop)
+    for offset in boundaries[first:last] if text else ():
+        if offset > cursor:
+            tokens.append(text[cursor - start : offset - start])
+            cursor = offset
+
+        closed = closing.get(offset, 0)
+        if offset == start and start:
+            closed -= 1
+        elif offset == stop:
+            closed = min(closed, 1)
+        if closed > 0:
+            tokens.extend([None] * closed)
+            tagged = True
+
+        if offset < stop and offset in opening:
+            tokens.extend(opening[offset])
+            tagged = True
+
+    if not tagged:
+        return []
+
+    if stop > cursor:
+        tokens.append(text[cursor - start :])
+
+    return tokens
+
+
+def unwrap(node: _Element) -> _Element:
+    """Return the smallest subtree that holds `node` and any promotion in it.
+
+    Spans are promoted through wrappers, elements with nothing in them but a
+    single child. As long as `node` is a wrapper, or is wrapped itself, a
+    span can move above it.
+    """
+    parent = node.getparent()
+    while parent is not None and (is_wrapper(node) or is_wrapper(parent)):
+        node, parent = parent, parent.getparent()
+
+    return node
+
+
+def is_wrapper(node: _Element) -> bool:
+    return has_single_child(node) and not node.text and not node.tail
+
+
+def normalize_regions(
+    subtrees: Iterable[_Element], parents: Iterable[_Element]
+) -> None:
+    """Normalise `subtrees`, then merge the children of `parents`.
+
+    This is `normalize_spans` restricted to the parts of a tree that
+    changed, assuming the rest of it is normalised already. Subtrees within
+    other subtrees are only normalised once, and parents are merged from the
+    deepest up, like in a full traversal.
+    """
+    subtrees = set(subtrees)
+    covered = {
+        subtree
+        for subtree in subtrees
+        if not any(node in subtrees for node in subtree.iterancestors())
+    }
+    for subtree in covered:
+        normalize_spans(subtree)
+
+    depths = {
+        parent: sum(1 for _ in parent.iterancestors()) for parent in parents
+    }
+    for parent in sorted(depths, key=depths.__getitem__, reverse=True):
+        if parent not in covered and not any(
+            node in covered for node in parent.iterancestors()
+        ):
+            merge_runs(parent)
+
+
 def annotate_text(
-    elem: _Element, text: str, open_spans: list[str], position: str
-) -> tuple[_Element, list[_Element]]:
-    new_spans: list[_Element] = []
-    splits = re.findall(rf"{tag_pattern}|[^<>]+", text)
+    elem: _Element, text: str, open_spans: list[Span], position: str
+) -> tuple[_Element, list[Span]]:
+    return insert_tokens(elem, markup_tokens(text), open_spans, position)
+
 
+def markup_tokens(text: str) -> Iterator[Span | str | None]:
+    """Split annotated `text` into the tokens taken by `insert_tokens`.
+
+    Opening ``span`` and ``div`` tags become `Span` descriptions, closing
+    ``span`` tags become None, and anything else is text.
+    """
+    for split in markup_regex.findall(text):
+        if split.startswith("<div"):
+            yield Span("div", attribs(split))
+        elif split.startswith("<span"):
+            yield Span("span", attribs(split))
+        elif split == "</span>":
+            yield None
+        elif split != "</div>":
+            yield split
+
+
+def insert_tokens(
+    elem: _Element,
+    tokens: Iterable[Span | str | None],
+    open_spans: list[Span],
+    position: str,
+    inserted: list[_Element] | None = None,
+) -> tuple[_Element, list[Span]]:
+    """Replace the text or tail of `elem` with the annotation in `tokens`.
+
+    :param open_spans: Spans left open by the previous text node, which are
+        continued here.
+    :param inserted: If given, the span elements created are appended to it.
+    :return: `elem` and the spans left open at the end of `tokens`.
+    """
+    new_spans: list[Span] = []
     context = elem
 
     # Reset `elem`'s text or tail. Those will be decided here.
@@ -316,51 +1333,50 @@ def annotate_text(
         elem.tail = ""
 
     for open_span in open_spans:
-        subspan = deepcopy(open_span)
+        subspan = open_span.element()
         if position == "text":
             context.insert(0, subspan)
         else:
             context.addnext(subspan)
+        if inserted is not None:
+            inserted.append(subspan)
         context = subspan
         position = "text"
 
-    for split in splits:
-        if split.startswith("<div"):
-            # move prefix declarations from the div to the root
-            div = Element("div", **attribs(split))
+    for token in tokens:
+        if token is None:
+            position = "tail"
+            if new_spans:
+                new_spans.pop()
+            else:
+                open_spans.pop()
+
+        elif isinstance(token, str):
+            if position == "text":
+                context.text = concat(context.text, token)
+            else:
+                context.tail = concat(context.tail, token)
 
+        elif token.tag == "div":
+            # move prefix declarations from the div to the root
             root = elem
             while root.getparent() is not None:
                 root = root.getparent()
 
-            copy_curies(source=div, target=root)
+            copy_curies(source=token.element(), target=root)
 
-        elif split.startswith("<span"):
-            new = Element("span", **attribs(split))
+        else:
+            new = token.element()
             if position == "text":
                 context.insert(0, new)
             else:
                 context.addnext(new)
+            if inserted is not None:
+                inserted.append(new)
             context = new
-            new_spans.append(deepcopy(new))
+            new_spans.append(token)
             position = "text"
 
-        elif split == "</span>":
-            position = "tail"
-            if new_spans:
-                new_spans.pop()
-            else:
-                open_spans.pop()
-
-        elif split == "</div>":
-            pass
-
-        else:
-            if position == "text":
-                context.text = concat(context.text, split)
-            else:
-                context.tail = concat(context.tail, split)
-
     return elem, open_spans + new_spans
 
 
@@ -370,95 +1386,143 @@ def copy_curies(source: Element, target: Element) -> None:
 
 
 def curies(elem: Element) -> set[str]:
-    prefix = r"[a-zA-Z_][a-zA-Z_\-\.\d]*"
-
-    # https://www.rfc-editor.org/rfc/rfc3986#appendix-B
-    uri = (
-        r"[^:/?#]+:"  # Scheme, ex. http:
-        r"(?://[^/?# ]+)?"  # Authority (optional)
-        r"[^?# ]*"  # Path
-        r"(?:\?(?:[^# ]*))?"  # Query (optional)
-        r"(?:#(?:\S*))?"  # Fragment (optional)
-    )
-
-    curie = re.compile(rf"({prefix}: ?{uri})")
-
-    return set(re.findall(curie, elem.attrib.get("prefix", "")))
+    return set(curie_regex.findall(elem.attrib.get("prefix", "")))
 
 
 def promote_spans(tree: _ElementTree) -> _Element | _ElementTree:
-    for node in tree.iter():
-        if node.tag == "span":
-            promote_span(node)
+    for node in list(tree.iter("span")):
+        promote_span(node)
 
     return tree
 
 
 def promote_span(span: _Element) -> None:
+    """Move `span` above the elements that do nothing but wrap it.
+
+    The wrappers take over the content of the span, so that
+    ``<italic><span>P</span></italic>`` becomes
+    ``<span><italic>P</italic></span>``. Nodes are moved in place, and the root
+    of the tree is never wrapped.
+    """
     parent = span.getparent()
     while (
         parent is not None
-        and len(parent) == 1
+        and parent.getparent() is not None
+        and has_single_child(parent)
         and not parent.text
         and not parent.tail
+        and not span.tail
     ):
-        newspan = deepcopy(span)
+        grandparent = parent.getparent()
         parent.remove(span)
+        parent.text, span.text = span.text, None
+        parent.extend(list(span))
+        grandparent.replace(parent, span)
+        span.append(parent)
+        parent = span.getparent()
 
-        newspan.tail, parent.tail = parent.tail, None
-        parent.text, newspan.text = newspan.text, None
-        for child in newspan.getchildren():
-            parent.append(child)
 
-        try:
-            parent.getparent().replace(parent, newspan)
-        except AttributeError:
-            pass
-        finally:
-            newspan.append(parent)
+def has_single_child(node: _Element) -> bool:
+    # Unlike len(node), this does not count every child of `node`.
+    first = next(iter(node), None)
+    return first is not None and first.getnext() is None
 
 
 def merge_children(tree: _Element | _ElementTree) -> _Element | _ElementTree:
-    for node in tree.iter():
-        for cursor in range(len(node) - 1, 0, -1):
-            current = node[cursor]
-            preceding = node[cursor - 1]
-            if (
-                current.tag == preceding.tag
-                and current.attrib == preceding.attrib
-                and not preceding.tail
-            ):
-                node.replace(preceding, merge_nodes(preceding, current))
-                node.remove(current)
+    """Merge the runs of equal adjacent children of every node in `tree`.
+
+    Nodes are visited bottom-up, each once its subtree is merged, so that the
+    result only depends on the subtree of every node, and a part of the tree
+    can be merged on its own, as `annotate_spans` does.
+    """
+    for _, node in list(iterwalk(tree, events=("end",))):
+        merge_runs(node)
 
     return tree
 
 
-def merge_nodes(left: _Element, right: _Element) -> _Element:
-    new = Element(left.tag, left.attrib)
+def normalize_spans(tree: _Element | _ElementTree) -> _Element | _ElementTree:
+    """Promote and merge the spans of `tree` in a single traversal.
+
+    Equivalent to ``merge_children(promote_spans(tree))``: spans are promoted
+    on the way down, in the same order as in `promote_spans`, and the children
+    of every node are merged on the way up, once its subtree is final.
+    """
+    for event, node in list(iterwalk(tree, events=("start", "end"))):
+        if event == "end":
+            merge_runs(node)
+        elif node.tag == "span":
+            promote_span(node)
+
+    return tree
 
-    for child in left:
-        new.append(child)
-    new.text = left.text
 
+def merge_runs(node: _Element) -> None:
+    """Merge every run of equal adjacent children of `node` into one child.
+
+    Runs are merged from the right, and only siblings are merged: the
+    children meeting where two nodes are joined are left apart.
+    """
     try:
-        new[-1].tail = right.text
+        child = node[-1]
     except IndexError:
-        new.text = concat(new.text, right.text)
+        return
+
+    while child is not None:
+        preceding = child.getprevious()
+        if preceding is not None and mergeable(preceding, child):
+            child = absorb(preceding, child)
+        else:
+            child = preceding
 
-    for child in right:
-        new.append(child)
 
-    new.tail = right.tail
+def mergeable(left: _Element, right: _Element) -> bool:
+    return (
+        isinstance(left.tag, str)
+        and left.tag == right.tag
+        and left.attrib == right.attrib
+        and not left.tail
+    )
+
+
+def absorb(left: _Element, right: _Element) -> _Element:
+    """Merge `left` into `right`, its equal next sibling.
+
+    The content of `left` is moved to the front of `right`, which takes its
+    place. Since runs are merged from the right, `right` is the one that grows,
+    and only the children of `left` are ever moved. As in the original
+    `merge_children`, the text of `right` replaces the tail of the last child
+    of `left`.
+    """
+    first = next(iter(right), None)
+    try:
+        last = left[-1]
+    except IndexError:
+        last = None
+        right.text = concat(left.text, right.text)
+    else:
+        last.tail = right.text
+        right.text = left.text
+
+    for child in list(left):
+        if first is None:
+            right.append(child)
+        else:
+            first.addprevious(child)
+    left.getparent().remove(left)
 
-    return new
+    return right
 
 
 def attribs(string: str) -> dict[str, str]:
-    invalid_chars = r"\"'<>=\x00-\x1f\x7f-\x9f"
-    attribute = rf"([^ {invalid_chars}]+)"
-    value = rf"[\"\']([^{invalid_chars}]+)[\"\']"
-    return dict(re.findall(rf"{attribute}={value}", string))
+    return dict(parse_attribs(string))
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_attribs(string: str) -> tuple[tuple[str, str], ...]:
+    # Annotations repeat the same few tags over and over. The attributes are
+    # cached as a tuple, so that every caller gets a dict of its own.
+    return tuple(attrib_regex.findall(string))
 
 
 def chars(text: str) -> Iterator[str]:
@@ -469,11 +1533,10 @@ def chars(text: str) -> Iterator[str]:
     as well.
     """
 
-    tag_char = rf"({open_tag})|({closed_tag})|(.)"
     current: list[str] = []
 
-    for split in re.findall(tag_char, text):
-        last_aint_tag = current and re.match(tag_pattern, current[-1]) is None
+    for split in tag_char_regex.findall(text):
+        last_aint_tag = bool(current) and tag_regex.match(current[-1]) is None
         match split:
             case ("", s, ""):
                 current.append(s)
@@ -490,23 +1553,190 @@ def chars(text: str) -> Iterator[str]:
         yield "".join(current)
 
 
+class TextAlignment:
+    """Map offsets in a plain text to slices of its annotated version.
+
+    The annotated text is divided into units, one for each character of the
+    plain text. A unit holds its character together with the tags attached
+    to it, in the same way as `chars`: the opening tags that precede the
+    character and a closing tag that immediately follows it.
+
+    Rather than storing every unit, the table records the runs of plain text
+    between tags: where each run starts in the plain and in the annotated
+    text, and where the unit of its last character ends. Any span can then be
+    sliced out of the annotated text with two binary searches.
+    """
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.plain_starts = array("q")
+        self.xml_starts = array("q")
+        self.last_ends = array("q")
+
+        length = 0
+        cursor = 0
+        for match in tag_regex.finditer(text):
+            start, end = match.span()
+            if start > cursor:
+                self.plain_starts.append(length)
+                self.xml_starts.append(cursor)
+                closing = text.startswith("</", start)
+                self.last_ends.append(end if closing else start)
+                length += start - cursor
+            cursor = end
+
+        if len(text) > cursor:
+            self.plain_starts.append(length)
+            self.xml_starts.append(cursor)
+            self.last_ends.append(len(text))
+            length += len(text) - cursor
+
+        self.length = length
+        self._run = 0
+
+    def __len__(self) -> int:
+        return self.length
+
+    def unit_end(self, offset: int) -> int:
+        """Return the end in the annotated text of the unit at `offset`."""
+        starts = self.plain_starts
+        run = self._run
+        # Spans are usually requested in order, so try the run of the last
+        # lookup before searching.
+        if not starts[run] <= offset < self._run_end(run):
+            run = self._run = bisect.bisect_right(starts, offset) - 1
+
+        if offset == self._run_end(run) - 1:
+            return self.last_ends[run]
+
+        return self.xml_starts[run] + offset - starts[run] + 1
+
+    def _run_end(self, run: int) -> int:
+        if run + 1 < len(self.plain_starts):
+            return self.plain_starts[run + 1]
+        return self.length
+
+    def span(self, start: int, stop: int) -> str:
+        """Return the annotated text of the plain characters `start:stop`.
+
+        Tags that follow the last plain character are attached to the final
+        span that reaches past the end of the plain text.
+        """
+        if stop <= start or start > self.length:
+            return ""
+
+        begin = self.unit_end(start - 1) if start else 0
+        if stop > self.length:
+            return self.text[begin:]
+
+        return self.text[begin : self.unit_end(stop - 1)]
+
+
 def split_metadata_body(xml: str) -> tuple[str, str]:
-    xml_sans_chunk_tag = re.sub(r"</?chunk>", "", xml)
-    splits = re.split(r"(</article-meta>)", xml_sans_chunk_tag)
-    try:
-        metadata = splits[0] + splits[1]
-        body = splits[2]
-        return metadata.strip(), body.strip()
-    except IndexError:
+    """Split an annotation document after its ``article-meta`` element.
+
+    ``chunk`` tags are dropped from both parts.
+    """
+    xml = chunk_tag_regex.sub("", xml)
+    metadata, end, body = xml.partition(METADATA_END)
+    if not end:
         raise RuntimeError("Your XML does not have the expected format")
 
+    return (metadata + end).strip(), body.strip()
+
+
+def stream_metadata_body(
+    stream: IO[str], size: int = 2**16
+) -> tuple[str, Iterator[str]]:
+    """Split the document read from `stream` like `split_metadata_body`.
+
+    The metadata is read right away. The body comes in pieces of about `size`
+    characters, read from `stream` as the iterator is consumed, so that it
+    never has to be held in memory as a whole.
+    """
+    pieces = without_chunk_tags(iter(functools.partial(stream.read, size), ""))
+    metadata: list[str] = []
+    carry = ""
+
+    for piece in pieces:
+        text = carry + piece
+        index = text.find(METADATA_END)
+        if index >= 0:
+            index += len(METADATA_END)
+            metadata.append(text[:index])
+            body = itertools.chain((text[index:],), pieces)
+            return "".join(metadata).strip(), stripped(body)
+
+        # The end of the metadata may straddle two pieces.
+        cut = max(len(text) - len(METADATA_END) + 1, 0)
+        metadata.append(text[:cut])
+        carry = text[cut:]
+
+    raise RuntimeError("Your XML does not have the expected format")
+
+
+def without_chunk_tags(pieces: Iterable[str]) -> Iterator[str]:
+    """Drop the ``chunk`` tags from a document read in `pieces`."""
+    carry = ""
+    for piece in pieces:
+        text = carry + piece
+        carry = ""
+
+        # Hold back what could be the beginning of a tag.
+        start = text.rfind("<", max(len(text) - len("</chunk>"), 0))
+        if start >= 0 and any(
+            tag.startswith(text[start:]) for tag in ("<chunk>", "</chunk>")
+        ):
+            text, carry = text[:start], text[start:]
+
+        if text := chunk_tag_regex.sub("", text):
+            yield text
+
+    if carry := chunk_tag_regex.sub("", carry):
+        yield carry
+
+
+def stripped(pieces: Iterable[str]) -> Iterator[str]:
+    """Strip the whitespace around the text made up of `pieces`."""
+    pieces = iter(pieces)
+    for piece in pieces:
+        if piece := piece.lstrip():
+            break
+    else:
+        return
+
+    whitespace = ""
+    for piece in itertools.chain((piece,), pieces):
+        text = piece.rstrip()
+        if text:
+            yield whitespace + text
+            whitespace = piece[len(text) :]
+        else:
+            whitespace += piece
+
 
 def replace_annotation(original: str, replacement: str) -> str:
-    new_annotation = re.sub(
-        r'<div class="chunk-body"[^>]*>(.*)</div>', r"\1", replacement
-    )
-    return re.sub(
-        r"(<chunk-body[^>]*>)(.*)(</chunk-body.*)",
-        rf"\1{new_annotation}\3",
-        original,
-    )
+    """Put the annotated content of `replacement` in the ``chunk-body`` of
+    `original`.
+
+    The ``chunk-body`` div around the content of `replacement` is dropped.
+    Both documents are spliced where their outermost tags are found, in a
+    single scan.
+    """
+    start = replacement.find('<div class="chunk-body"')
+    content_start = replacement.find(">", start) + 1
+    content_end = replacement.rfind("</div>")
+    if start >= 0 and 0 < content_start <= content_end:
+        replacement = (
+            replacement[:start]
+            + replacement[content_start:content_end]
+            + replacement[content_end + len("</div>") :]
+        )
+
+    start = original.find("<chunk-body")
+    content_start = original.find(">", start) + 1
+    content_end = original.rfind("</chunk-body")
+    if start < 0 or not 0 < content_start <= content_end:
+        return original
+
+    return original[:content_start] + replacement + original[content_end:]
@@ -0,0 +1,38 @@
+from collections.abc import Callable
+
+import pytest
+
+
+def synthetic_article(sections: int = 6, pmid: int = 123) -> bytes:
+    paragraph = (
+        "<p>The <italic>lacZ</italic> gene of "
+        '<named-content xlink:href="#T1">E. coli</named-content> was '
+        "expressed under the control of the <sc>tac</sc> promoter.</p>"
+    )
+    body = "\n".join(
+        f"<h2>Section {i}</h2>\n{paragraph * (i + 1)}\n"
+        f'<fig id="F{i}"><caption>Figure {i}</caption></fig>\n'
+        f"<sec><p>Not a segment</p></sec>"
+        for i in range(sections)
+    )
+    return (
+        '<article xmlns="https://jats.nlm.nih.gov/ns/archiving/1.3/" '
+        'xmlns:xlink="http://www.w3.org/1999/xlink">\n'
+        "<front><article-meta>"
+        f'<article-id pub-id-type="pmid">{pmid}</article-id>'
+        '<article-id pub-id-type="doi">10.1000/xyz</article-id>'
+        "</article-meta></front>\n"
+        '<div class="abstract"><p>Abstract.</p></div>\n'
+        f'<div class="article-body">\n{body}\n</div>\n'
+        "</article>"
+    ).encode()
+
+
+@pytest.fixture
+def article() -> bytes:
+    return synthetic_article()
+
+
+@pytest.fixture
+def make_article() -> Callable[..., bytes]:
+    return synthetic_article
@@ -0,0 +1,92 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from xmlparser.aio import iter_chunks
+from xmlparser.batch import iter_sources, run_batch
+
+
+class FakeStore:
+    """In-process stand-in for an object store, counting concurrent reads."""
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.reading = 0
+        self.most_reading = 0
+
+    def fetcher(self, key):
+        async def fetch():
+            self.reading += 1
+            self.most_reading = max(self.most_reading, self.reading)
+            await asyncio.sleep(0.01)
+            self.reading -= 1
+            if key not in self.objects:
+                raise KeyError(key)
+            return self.objects[key]
+
+        return fetch
+
+
+async def collect(sources, **kwargs):
+    return [result async for result in iter_chunks(sources, **kwargs)]
+
+
+def by_source(results):
+    return sorted(
+        (result.source, result.pmid, result.chunks, result.error is None)
+        for result in results
+    )
+
+
+def test_local_directory_matches_run_batch(tmp_path, make_article):
+    for pmid in (1, 2, 3):
+        (tmp_path / f"{pmid}.xml").write_bytes(make_article(pmid=pmid))
+    (tmp_path / "broken.xml").write_bytes(b"<article><front>")
+    sources = list(iter_sources(str(tmp_path)))
+
+    results = asyncio.run(collect(sources, max_in_flight=2))
+
+    assert by_source(results) == by_source(run_batch(sources, workers=1))
+    assert [ok for *_, ok in by_source(results)] == [True, True, True, False]
+
+
+def test_fake_store_with_backpressure(make_article):
+    store = FakeStore({f"{n}.xml": make_article(pmid=n) for n in range(12)})
+    sources = [(key, store.fetcher(key)) for key in [*store.objects, "gone"]]
+
+    async def consume_slowly():
+        results = []
+        async for result in iter_chunks(sources, max_in_flight=3):
+            await asyncio.sleep(0.02)
+            results.append(result)
+        return results
+
+    results = asyncio.run(consume_slowly())
+
+    assert store.most_reading <= 3
+    assert len(results) == 13
+    assert {result.pmid for result in results} == set(range(12)) | {None}
+    (missing,) = [result for result in results if result.error]
+    assert missing.source == "gone"
+    assert missing.error.startswith("KeyError")
+
+
+def test_process_pool_and_async_sources(make_article):
+    async def sources():
+        for pmid in (5, 6):
+            yield str(pmid), make_article(pmid=pmid)
+
+    with ProcessPoolExecutor(2) as pool:
+        results = asyncio.run(collect(sources(), executor=pool))
+
+    assert sorted(result.pmid for result in results) == [5, 6]
+
+
+def test_errors_from_the_sources_are_raised(make_article):
+    def sources():
+        yield "1", make_article(pmid=1)
+        raise OSError("listing failed")
+
+    with pytest.raises(OSError, match="listing failed"):
+        asyncio.run(collect(sources()))
@@ -0,0 +1,112 @@
+import json
+import tarfile
+import threading
+from io import BytesIO
+
+from xmlparser.batch import (
+    BatchStats,
+    iter_sources,
+    main,
+    process_article,
+    run_batch,
+    transform_batch,
+)
+from xmlparser.xmlparser import stylesheets, transform_article
+
+
+def write_corpus(directory, make_article):
+    for pmid in (1, 2, 3):
+        (directory / f"{pmid}.xml").write_bytes(make_article(pmid=pmid))
+    (directory / "broken.xml").write_bytes(b"<article><front>")
+    (directory / "notes.txt").write_text("not an article")
+
+
+def test_process_article_isolates_failures(article):
+    result = process_article("ok", article, minlen=300, maxlen=600)
+    assert result.error is None
+    assert result.pmid == 123
+    assert result.doi == "10.1000/xyz"
+    assert [chunk.pos for chunk in result.chunks] == list(
+        range(len(result.chunks))
+    )
+
+    broken = process_article("broken", b"<article>")
+    assert broken.error.startswith("XMLSyntaxError")
+    assert broken.chunks == []
+
+
+def test_run_batch_keeps_order_across_workers(tmp_path, make_article):
+    write_corpus(tmp_path, make_article)
+    sources = list(iter_sources(str(tmp_path)))
+    assert [name.rsplit("/", 1)[-1] for name, _ in sources] == [
+        "1.xml",
+        "2.xml",
+        "3.xml",
+        "broken.xml",
+    ]
+
+    stats = BatchStats()
+    results = list(run_batch(sources, workers=2, stats=stats))
+    assert [result.pmid for result in results] == [1, 2, 3, None]
+    assert results[-1].error is not None
+    assert (stats.files, stats.failures) == (4, 1)
+
+    assert results == list(run_batch(sources, workers=1))
+
+
+def test_thread_pool(tmp_path, make_article):
+    write_corpus(tmp_path, make_article)
+    sources = list(iter_sources(str(tmp_path)))
+    assert list(run_batch(sources, workers=3, threads=True)) == list(
+        run_batch(sources, workers=1)
+    )
+
+    articles = [make_article(pmid=pmid) for pmid in range(12)]
+    assert list(transform_batch(articles, workers=3)) == [
+        transform_article(article) for article in articles
+    ]
+
+
+def test_stylesheets_are_compiled_per_thread():
+    compiled = []
+
+    def compile_twice():
+        compiled.append((stylesheets.get("jats"), stylesheets.get("jats")))
+
+    threads = [threading.Thread(target=compile_twice) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(first is second for first, second in compiled)
+    assert compiled[0][0] is not compiled[1][0]
+    assert stylesheets.get("jats") not in {compiled[0][0], compiled[1][0]}
+
+
+def test_tarball_sources(tmp_path, make_article):
+    path = tmp_path / "corpus.tar.gz"
+    with tarfile.open(path, "w:gz") as tar:
+        for pmid in (7, 8):
+            data = make_article(pmid=pmid)
+            info = tarfile.TarInfo(f"articles/{pmid}.nxml")
+            info.size = len(data)
+            tar.addfile(info, BytesIO(data))
+
+    sources = list(iter_sources(str(path)))
+    assert [name for name, _ in sources] == [
+        f"{path}:articles/7.nxml",
+        f"{path}:articles/8.nxml",
+    ]
+    assert [result.pmid for result in run_batch(sources, workers=1)] == [7, 8]
+
+
+def test_cli_writes_jsonl(tmp_path, capsys, make_article):
+    write_corpus(tmp_path, make_article)
+    output = tmp_path / "out.jsonl"
+
+    assert main([str(tmp_path / "*.xml"), "-o", str(output), "-j", "2"]) == 1
+
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [record["pmid"] for record in records] == [1, 2, 3, None]
+    assert "4 files (1 failed)" in capsys.readouterr().err
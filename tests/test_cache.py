@@ -0,0 +1,72 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from xmlparser import cache as cache_module
+from xmlparser.cache import ArticleCache
+from xmlparser.xmlparser import fromstring, get_chunks, transform_article
+
+
+def chunk_articles(cache, articles):
+    return [
+        cache.chunks(article, minlen=300, maxlen=600) for article in articles
+    ]
+
+
+def test_hits_skip_parsing(tmp_path, monkeypatch, article):
+    cache = ArticleCache(tmp_path / "cache.sqlite")
+    expected = list(
+        get_chunks(fromstring(article).getroottree(), minlen=300, maxlen=600)
+    )
+
+    assert cache.chunks(article, minlen=300, maxlen=600) == expected
+    assert cache.transform(article) == transform_article(article)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("parsed on a cache hit")
+
+    monkeypatch.setattr(cache_module, "parse_file", fail)
+    monkeypatch.setattr(cache_module, "transform_article", fail)
+    assert cache.chunks(article, minlen=300, maxlen=600) == expected
+    assert cache.transform(article) == transform_article(article)
+    assert (cache.stats.hits, cache.stats.misses) == (2, 2)
+
+    with pytest.raises(AssertionError):
+        cache.chunks(article, minlen=300, maxlen=700)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, make_article):
+    cache = ArticleCache(tmp_path / "cache.sqlite")
+    articles = [make_article(pmid=pmid) for pmid in range(4)]
+    chunk_articles(cache, articles)
+    entry_size = cache.size() // 4
+
+    cache.clear()
+    cache.max_bytes = 3 * entry_size + entry_size // 2
+    chunk_articles(cache, articles[:3])
+    cache.chunks(articles[0], minlen=300, maxlen=600)
+    cache.chunks(articles[3], minlen=300, maxlen=600)
+
+    assert len(cache) == 3
+    assert cache.size() <= cache.max_bytes
+    misses = cache.stats.misses
+    chunk_articles(cache, [articles[0], articles[2], articles[3]])
+    assert cache.stats.misses == misses
+    cache.chunks(articles[1], minlen=300, maxlen=600)
+    assert cache.stats.misses == misses + 1
+
+
+def test_cache_is_shared_across_processes(tmp_path, make_article):
+    cache = ArticleCache(tmp_path / "cache.sqlite")
+    articles = [make_article(pmid=pmid) for pmid in range(8)]
+
+    with ProcessPoolExecutor(4) as pool:
+        futures = [
+            pool.submit(chunk_articles, cache, articles) for _ in range(4)
+        ]
+        results = [future.result() for future in futures]
+
+    assert all(result == results[0] for result in results)
+    assert len(cache) == len(articles)
+    assert chunk_articles(cache, articles) == results[0]
+    assert cache.stats.misses == 0
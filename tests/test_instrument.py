@@ -0,0 +1,101 @@
+import logging
+import threading
+from io import BytesIO
+
+from xmlparser.instrument import (
+    LoggingSink,
+    MemorySink,
+    PrometheusSink,
+    instrument,
+)
+from xmlparser.batch import run_batch
+from xmlparser.xmlparser import (
+    get_chunks,
+    parse_file,
+    reinsert_tags,
+    write_tree,
+)
+
+
+def test_stages_are_recorded_only_when_instrumented(tmp_path, article):
+    path = tmp_path / "article.xml"
+    path.write_bytes(article)
+
+    with instrument() as stats:
+        chunks = list(get_chunks(parse_file(path), minlen=300, maxlen=600))
+
+    stages = stats.stages
+    assert stages["parse_file"].calls == 1
+    assert stages["parse_file"].bytes_in == len(article)
+    assert stages["parse_file"].elements > 0
+    assert stages["get_chunks"].elements == len(chunks)
+    assert stages["get_chunks"].bytes_out == sum(
+        len(chunk.content) for chunk in chunks
+    )
+    assert stages["build_chunk"].calls == len(chunks)
+    assert stages["get_chunks"].seconds >= stages["get_segments"].seconds
+    assert "get_chunks" in stats.report()
+
+    list(get_chunks(parse_file(path)))
+    assert stages["parse_file"].calls == 1
+
+
+def test_logging_and_prometheus_sinks(tmp_path, caplog):
+    path = tmp_path / "stages.prom"
+    text = 'the <span typeof="d3o:Gene">lac</span> operon'
+
+    with caplog.at_level(logging.DEBUG, logger="xmlparser.instrument"):
+        with instrument(PrometheusSink(path), LoggingSink(), MemorySink()):
+            result = reinsert_tags(text, "<p>the lac operon</p>")
+
+    lines = path.read_text().splitlines()
+    assert caplog.messages[-1].startswith("reinsert_tags: ")
+    assert 'xmlparser_stage_calls_total{stage="reinsert_tags"} 1' in lines
+    bytes_out = 'xmlparser_stage_bytes_out_total{stage="reinsert_tags"}'
+    assert f"{bytes_out} {len(result)}" in lines
+
+
+def test_overlapping_blocks_keep_their_own_sinks(article):
+    barrier = threading.Barrier(2)
+    stats = {}
+
+    def run(name, func):
+        with instrument() as stats[name]:
+            barrier.wait()
+            func()
+            barrier.wait()
+
+    threads = [
+        threading.Thread(
+            target=run, args=("parse", lambda: parse_file(article))
+        ),
+        threading.Thread(
+            target=run,
+            args=("reinsert", lambda: reinsert_tags("x", "<p>x</p>")),
+        ),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert set(stats["parse"].stages) == {"parse_file"}
+    assert "reinsert_tags" in stats["reinsert"].stages
+    assert "parse_file" not in stats["reinsert"].stages
+
+
+def test_thread_workers_are_instrumented(article):
+    sources = [(str(pmid), article) for pmid in range(4)]
+    with instrument() as stats:
+        list(run_batch(sources, workers=2, threads=True))
+
+    assert stats.stages["get_chunks"].calls == len(sources)
+
+
+def test_stage_without_input_size(article):
+    with instrument() as stats:
+        write_tree(parse_file(article), BytesIO())
+
+    assert stats.stages["write_tree"].bytes_in is None
+    assert stats.stages["parse_file"].bytes_in == len(article)
+    assert "write_tree" in stats.report()
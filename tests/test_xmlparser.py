@@ -1,19 +1,59 @@
+import bz2
+import gzip
+import lzma
+import mmap
+import os
+import subprocess
+import sys
+import tarfile
 from copy import deepcopy
+from io import BytesIO, StringIO
+from pathlib import Path
 
+import pytest
 from lxml.etree import Element
+from xmlparser import xmlparser
 from xmlparser.xmlparser import (
+    ChunkBatch,
+    ClosingReader,
+    StylesheetRegistry,
+    TextAlignment,
+    TextChunk,
+    XMLSyntaxError,
+    annotate_spans,
+    attribs,
     chars,
+    close_tags,
     clean_namespaces,
     copy_curies,
     curies,
     fromstring,
+    get_chunks,
+    get_doi,
+    get_metadata,
+    get_pmid,
+    get_text,
     merge_children,
+    normalize_spans,
+    parse_file,
     promote_spans,
+    register_stylesheet,
     reinsert_tags,
     remove_tags,
+    remove_tags_with_offsets,
     replace_annotation,
+    segment_to_string,
+    split_metadata_body,
+    stream_chunks,
+    stream_metadata_body,
+    stylesheets,
+    tar_members,
+    text_spans,
+    tokenize_xml,
     tostring,
     transform_article,
+    tree_as_string,
+    write_tree,
 )
 
 tryptophan = (
@@ -84,6 +124,39 @@ def test_copy_curies():
     )
 
 
+def test_attribs_are_parsed_into_fresh_dicts():
+    tag = '<span typeof="d3o:Strain" resource="#T3">'
+    first = attribs(tag)
+    first["typeof"] = "changed"
+
+    assert attribs(tag) == {"typeof": "d3o:Strain", "resource": "#T3"}
+
+
+def test_clean_namespaces():
+    elem = fromstring(
+        '<a xmlns="urn:a" xmlns:m="urn:m" xmlns:xlink="urn:xlink">'
+        '<!-- note --><?pi x?><m:b xlink:href="#1">text</m:b><c/></a>'
+    )
+    expected = (
+        '<a xmlns:xlink="urn:xlink"><!-- note --><?pi x?>'
+        '<b xlink:href="#1">text</b><c/></a>'
+    )
+
+    assert tostring(clean_namespaces(elem), encoding=str) == expected
+    assert tostring(clean_namespaces(elem), encoding=str) == expected
+
+    unused = fromstring('<a xmlns:m="urn:m"><b/></a>')
+    assert tostring(clean_namespaces(unused), encoding=str) == "<a><b/></a>"
+
+
+def test_segment_to_string_cleans_only_namespaced_segments():
+    clean = fromstring("<p>Text with <italic>markup</italic></p>")
+    assert segment_to_string(clean) == tostring(clean, encoding=str)
+
+    segment = fromstring('<p xmlns="urn:a">text <m:b xmlns:m="urn:m"/></p>')
+    assert segment_to_string(segment) == "<p>text <b/></p>"
+
+
 def test_extract_curies():
     div = Element(
         "div",
@@ -129,12 +202,116 @@ def test_non_tag_chars_iterator_works() -> None:
     ]
 
 
+def test_remove_tags_and_tokenize_xml() -> None:
+    assert remove_tags(tryptophan) == (
+        "with the indole precursor l-tryptophan, we observed"
+    )
+    assert tokenize_xml("<p>a\n<br/>b</p>") == [
+        "<p>",
+        "a",
+        "\n",
+        "<br/>",
+        "b",
+        "</p>",
+    ]
+
+
+def test_remove_tags_from_buffers() -> None:
+    data = tryptophan.encode()
+    text = remove_tags(tryptophan)
+
+    assert remove_tags(data) == text.encode()
+    assert remove_tags(memoryview(data)) == text.encode()
+
+    spans = text_spans(tryptophan)
+    assert "".join(tryptophan[s:e] for s, e in zip(*[iter(spans)] * 2)) == text
+
+    for buffer in (data, memoryview(data)):
+        spans = text_spans(buffer)
+        assert b"".join(buffer[s:e] for s, e in zip(*[iter(spans)] * 2)) == (
+            text.encode()
+        )
+
+    spans = text_spans("<p>a <i>b</i></p>tail")
+    assert list(spans) == [3, 5, 8, 9, 17, 21]
+
+
+def test_offset_map_translates_plain_offsets() -> None:
+    xml = '<p>The <span typeof="d3o:Gene">lacZ</span> gene</p>'
+    text, offsets = remove_tags_with_offsets(xml)
+
+    assert text == remove_tags(xml)
+    assert len(offsets) == len(text)
+
+    start, stop = offsets.span(4, 8)
+    assert xml[start:stop] == "lacZ"
+    start, stop = offsets.span(0, len(text))
+    assert xml[start:stop] == xml[3:-4]
+
+    for begin in range(len(text) + 1):
+        for end in range(begin, len(text) + 1):
+            start, stop = offsets.span(begin, end)
+            assert remove_tags(xml[start:stop]) == text[begin:end]
+
+    with pytest.raises(IndexError):
+        offsets.to_xml(len(text) + 1)
+
+
+def test_import_is_light() -> None:
+    code = "import sys, xmlparser; print(*sorted(sys.modules))"
+    modules = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+
+    assert "xmlparser.xmlparser" in modules
+    assert not {"nltk", "tarfile", "importlib.resources", "logging"} & set(
+        modules
+    )
+
+
+def test_tree_serialisation(tmp_path, article):
+    root = fromstring(article)
+    canonical = tree_as_string(root)
+    plain = tree_as_string(root, canonical=False)
+    assert plain == tostring(root, encoding=str)
+    assert fromstring(canonical).xpath("string()") == root.xpath("string()")
+
+    for mode, expected in ((True, canonical), (False, plain)):
+        path = tmp_path / f"{mode}.xml"
+        write_tree(root.getroottree(), path, canonical=mode)
+        assert path.read_text(encoding="utf-8") == expected
+
+        stream = BytesIO()
+        write_tree(root, stream, canonical=mode)
+        assert stream.getvalue().decode() == expected
+
+
+def test_closing_tags_attach_to_neighbouring_characters() -> None:
+    text = '<span a="1"><span a="2">l</span></span>-tryptophan'
+    assert list(chars(text))[:3] == [
+        '<span a="1"><span a="2">l</span>',
+        "</span>-",
+        "t",
+    ]
+
+    alignment = TextAlignment(text)
+    assert len(alignment) == len("l-tryptophan")
+    spans = [alignment.span(i, i + 1) for i in range(3)]
+    assert spans == list(chars(text))[:3]
+    assert alignment.span(2, 100) == "tryptophan"
+
+
 def test_remove_and_reinsert_tags_are_inverses() -> None:
     assert reinsert_tags(remove_tags(tryptophan), tryptophan) == tryptophan
     assert (
         reinsert_tags(remove_tags(spaced_tag_string), spaced_tag_string)
         == spaced_tag_string
     )
+    multiline = "<p>first line\n<italic>second</italic>\nthird</p>"
+    assert reinsert_tags(remove_tags(multiline), multiline) == multiline
 
 
 def test_remove_and_insert_with_annotation_is_valid_html() -> None:
@@ -198,6 +375,27 @@ def test_spans_to_the_top():
     assert tostring(promote_spans(tree), encoding="unicode") == spanlifted
 
 
+def test_promoted_spans_keep_their_surroundings():
+    tree = fromstring('<p><italic><span a="1">P</span>2</italic></p>')
+    assert (
+        tostring(promote_spans(tree), encoding="unicode")
+        == '<p><italic><span a="1">P</span>2</italic></p>'
+    )
+
+    tree = fromstring(
+        '<p><bold><italic><span a="1">x</span></italic></bold></p>'
+    )
+    assert (
+        tostring(promote_spans(tree), encoding="unicode")
+        == '<p><span a="1"><bold><italic>x</italic></bold></span></p>'
+    )
+
+    assert (
+        reinsert_tags('<span a="1">abc</span>', "<p>abc</p>")
+        == '<p><span a="1">abc</span></p>'
+    )
+
+
 def test_cousin_spans_should_be_merged_when_possible():
     tree = fromstring(spanlifted)
     assert (
@@ -206,6 +404,91 @@ def test_cousin_spans_should_be_merged_when_possible():
     )
 
 
+def test_normalize_spans_promotes_and_merges():
+    merged = tostring(
+        merge_children(fromstring(spanlifted)), encoding="unicode"
+    )
+    assert (
+        tostring(normalize_spans(fromstring(spanseq)), encoding="unicode")
+        == merged
+    )
+
+    tree = fromstring("<p>" + '<span a="1"><i>x</i></span>' * 3 + "</p>")
+    assert (
+        tostring(normalize_spans(tree), encoding="unicode")
+        == '<p><span a="1"><i>x</i><i>x</i><i>x</i></span></p>'
+    )
+
+
+def test_reinsert_tags_merges_only_runs_of_siblings():
+    # Children meeting where two siblings are merged are left apart.
+    xml = "<p><sub><sc><i>b</i>c</sc></sub><sub><sc>d</sc></sub></p>"
+    assert (
+        reinsert_tags(remove_tags(xml), xml)
+        == "<p><sub><sc><i>b</i>c</sc><sc>d</sc></sub></p>"
+    )
+    assert (
+        reinsert_tags(
+            '<span a="1">xyz</span>', "<p><i>x</i><i>y</i><i>z</i></p>"
+        )
+        == '<p><span a="1"><i>x</i><i>y</i><i>z</i></span></p>'
+    )
+
+    # Every run is merged, wherever the first merge happens.
+    for xml in (
+        "<p><a/><b>1</b><b>2</b><i><s/><s/></i></p>",
+        "<p><b>1</b><b>2</b><i><s/><s/></i></p>",
+    ):
+        assert tostring(
+            normalize_spans(fromstring(xml)), encoding="unicode"
+        ).endswith("<b>12</b><i><s></s></i></p>")
+
+
+def test_annotate_spans_matches_reinsert_tags():
+    xml = (
+        "<p>The <italic>lacZ</italic> gene of <italic>E. coli</italic> K12 "
+        "was <bold>expressed</bold>.</p>"
+    )
+    strain = {"typeof": "d3o:Strain"}
+    organism = {"typeof": "d3o:Organism"}
+    gene = {"typeof": "d3o:Gene"}
+    spans = [(4, 8, gene), (17, 28, strain), (17, 24, organism)]
+    annotated = (
+        'The <span typeof="d3o:Gene">lacZ</span> gene of '
+        '<span typeof="d3o:Strain"><span typeof="d3o:Organism">E. coli</span>'
+        " K12</span> was expressed."
+    )
+    assert remove_tags(annotated) == remove_tags(xml)
+
+    tree = annotate_spans(fromstring(xml), spans)
+    assert tostring(tree, method="html", encoding="unicode") == reinsert_tags(
+        annotated, xml
+    )
+
+    # Adjacent equal spans are merged once the second one is promoted above
+    # <sc>, in either paragraph.
+    chunk = (
+        "<chunk-body><p>the <sc>tac</sc></p> and <p>the <sc>tac</sc></p>"
+        "</chunk-body>"
+    )
+    spans = [(0, 4, gene), (4, 7, gene), (12, 16, gene), (16, 19, gene)]
+    paragraph = (
+        '<span typeof="d3o:Gene">the </span><span typeof="d3o:Gene">tac</span>'
+    )
+    annotated = f"{paragraph} and {paragraph}"
+    expected = reinsert_tags(annotated, chunk)
+    assert (
+        expected.count('<span typeof="d3o:Gene">the <sc>tac</sc></span>') == 2
+    )
+    tree = annotate_spans(fromstring(chunk), spans)
+    assert tostring(tree, method="html", encoding="unicode") == expected
+
+    with pytest.raises(ValueError):
+        annotate_spans(fromstring(xml), [(4, 10, gene), (8, 12, gene)])
+    with pytest.raises(ValueError):
+        annotate_spans(fromstring(xml), [(40, 60, gene)])
+
+
 def test_replace_annotation():
     og = """<annotation><journal-meta xmlns="https://dtd.nlm.nih.gov/ns/archiving/2.3/" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns:mml="http://www.w3.org/1998/Math/MathML" xmlns:xlink="http://www.w3.org/1999/xlink">
       <journal-id journal-id-type="nlm-ta">BMC Biotechnol</journal-id>
@@ -235,3 +518,245 @@ def test_replace_annotation():
 <article-meta xmlns="https://dtd.nlm.nih.gov/ns/archiving/2.3/" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns:mml="http://www.w3.org/1998/Math/MathML" xmlns:xlink="http://www.w3.org/1999/xlink">
     </article-meta><chunk-body prefix="d3o: https://purl.dsmz.de/schema/"><p>In a previous work [<xref ref-type="bibr" rid="B9">9</xref>] we described the cell-bound and extracellular <span class="entity" resource="#T1" typeof="d3o:Enzyme" id="1"><button class="entity" type="button" typeof="d3o:Enzyme" resource="#T1">cholesterol oxidase</button></span> activities from <italic><span class="entity" resource="#T2" typeof="d3o:Bacteria" id="2"><button class="entity" type="button" typeof="d3o:Bacteria" resource="#T2">R. erythropolis</button></span></italic> <span class="entity" resource="#T3" typeof="d3o:Strain" id="3"><button class="entity" type="button" typeof="d3o:Strain" resource="#T3">ATCC</button></span> <span class="entity" resource="#T4" typeof="d3o:Strain" id="4"><button class="entity" type="button" typeof="d3o:Strain" resource="#T4">25544</button></span>, achieving in optimal conditions 55% cell-bound and 45% extracellular activity. Their enzymatic properties strongly supported the idea that the particulate and the extracellular cholesterol oxidases are two different forms of the same enzyme with an estimated molecular mass of 55 kDa. In this work we optimize the culture conditions in a 2-liter fermentor of this extracellular <span class="entity" resource="#T1" typeof="d3o:Enzyme" id="5"><button class="entity" type="button" typeof="d3o:Enzyme" resource="#T1">cholesterol oxidase</button></span> producer strain and carry out the extraction, partial purification and concentration of both types of <span class="entity" resource="#T1" typeof="d3o:Enzyme" id="6"><button class="entity" type="button" typeof="d3o:Enzyme" resource="#T1">cholesterol oxidase</button></span> by using Triton X-114 phase separation. The results obtained are very promising for the use of this strain and this technique in the industrial processing of <span class="entity" resource="#T7" typeof="OOS" id="7">bacteria</span> to obtain <span class="entity" resource="#T1" typeof="d3o:Enzyme" id="8"><button class="entity" type="button" typeof="d3o:Enzyme" resource="#T1">cholesterol oxidase</button></span>.</p>                 <h3>Results and discussion</h3>                <h4>Batch cultivation of <span class="entity" resource="#T2" typeof="d3o:Bacteria" id="9"><button class="entity" type="button" typeof="d3o:Bacteria" resource="#T2">R. erythropolis</button></span> (<span class="entity" resource="#T10" typeof="d3o:Strain" id="10"><button class="entity" type="button" typeof="d3o:Strain" resource="#T10">ATCC 25544</button></span>)</h4>         <p>The <span class="entity" resource="#T7" typeof="OOS" id="11">bacteria</span> were grown on the GYS medium in a 2-liter scale fermentor in batch mode operation under pH and temperature controlled conditions. Under this conditions the cell yield was doubled (9.5 mg/ml vs. 4.8 mg/ml dry cell weight) and the cultivation time was reduced to one third (60 vs. 180 hours) as compared with shaken flasks. These results are in good agreement with the literature [<xref ref-type="bibr" rid="B12">12</xref>]. We found that addition of 2 g/l cholesterol to the culture broth [<xref ref-type="bibr" rid="B12">12</xref>], prepared as an aqueous <span class="entity" resource="#T12" typeof="d3o:Enzyme" id="12"><button class="entity" type="button" typeof="d3o:Enzyme" resource="#T12">emulsion</button></span> with the aid of Tween 80 at a weight ratio 2:1 results in a high yield of <span class="entity" typeof="d3o:Enzyme" resource="#T5" id="15">COX</span> production [<xref ref-type="bibr" rid="B9">9</xref>], but the preparation procedure of that <span class="entity" resource="#T12" typeof="d3o:Enzyme" id="13"><button class="entity" type="button" typeof="d3o:Enzyme" resource="#T12">emulsion</button></span> had a marked influence in the final enzyme yield, although not on the cell weight, as seen in Table <xref ref-type="table" rid="T1">1</xref>. The spray-dry method resulted advantageous because the cholesterol :Tween 80 <span class="entity" resource="#T12" typeof="d3o:Enzyme" id="14"><button class="entity" type="button" typeof="d3o:Enzyme" resource="#T12">emulsion</button></span> formed readily and COX production increased in overall by three times with respect to the preparation of the cholesterol:Tween 80 mixture at the flame. Enzyme production improvement resulted larger as cell-linked (3.8-fold) than as extracellular (2.3-fold). This overall increase of COX production can be due to a better availability of cholesterol to the cell since particle size obtained by spray-dry is smaller.</p>         <table-wrap position="float" id="T1">           <label>Table 1</label>                        <p>Effect of the cholesterol emuIsification method on the production of COX.</p>                      <table frame="hsides" rules="groups">             <thead>               <tr>                 <td>                 </td><td align="center" colspan="2">                   <bold>COX activity (U/ml)<sup>*</sup></bold>                 </td>                 <td>               </td></tr>             </thead>             <tbody>               <tr>                 <td align="center">                   <bold>Emulsification cholesterol method</bold>                 </td>                 <td align="center">                   <bold>Cell-linked</bold>                 </td>                 <td align="center">                   <bold>extracellular</bold>                 </td>                 <td align="center">                   <bold>Dry weight (mg/ml)</bold>                 </td>               </tr>               <tr>                 <td colspan="4">                   <hr>                 </td>               </tr>               <tr>                 <td align="center">Spray-dry</td>                 <td align="center">230</td>                 <td align="center">140</td>                 <td align="center">8.75</td>               </tr>               <tr>                 <td align="center">At the flame</td>                 <td align="center">60</td>                 <td align="center">60</td>                 <td align="center">9.05</td>               </tr>               <tr>                 <td align="center">Improvement</td>                 <td align="center">3.8</td>                 <td align="center">2.3</td>                 <td align="center">0.97</td>               </tr>             </tbody>           </table>           <table-wrap-foot>             <p><sup>*</sup>Enzymatic activity figures correspond to 70 hours of fermentation.</p></table-wrap-foot></table-wrap></chunk-body></annotation>"""
     )
+
+
+def test_replace_annotation_splices_multiline_content():
+    original = (
+        "<annotation><article-meta/>\n<chunk-body>\n<p>old</p>\n"
+        "</chunk-body>\n</annotation>"
+    )
+    replacement = (
+        '<div class="chunk-body" prefix="d3o: https://purl.dsmz.de/schema/">'
+        "\n1 \\n<p>new</p>\n</div>"
+    )
+
+    assert replace_annotation(original, replacement) == (
+        "<annotation><article-meta/>\n<chunk-body>\n1 \\n<p>new</p>\n"
+        "</chunk-body>\n</annotation>"
+    )
+    assert replace_annotation("<annotation/>", replacement) == "<annotation/>"
+
+
+def test_split_metadata_body():
+    xml = (
+        "<annotation><chunk>\n<article-meta><title>T</title></article-meta>"
+        "\n <chunk-body><p>body</p>\n</chunk-body> \n</chunk></annotation>"
+    )
+    metadata = "<annotation>\n<article-meta><title>T</title></article-meta>"
+    body = "<chunk-body><p>body</p>\n</chunk-body> \n</annotation>"
+    assert split_metadata_body(xml) == (metadata, body)
+
+    for size in (1, 3, 7, 1000):
+        streamed, pieces = stream_metadata_body(StringIO(xml), size=size)
+        assert (streamed, "".join(pieces)) == (metadata, body)
+
+    with pytest.raises(RuntimeError):
+        split_metadata_body("<annotation/>")
+    with pytest.raises(RuntimeError):
+        stream_metadata_body(StringIO("<annotation/>"))
+
+
+def test_stylesheets_are_compiled_once():
+    assert stylesheets.get("jats") is stylesheets.get("jats")
+    assert transform_article(tryptophan) == transform_article(tryptophan)
+
+
+def test_register_custom_stylesheet(tmp_path, monkeypatch):
+    # A registry of its own, so that "custom" does not outlive its file.
+    monkeypatch.setattr(xmlparser, "stylesheets", StylesheetRegistry())
+    path = tmp_path / "upper.xsl"
+    path.write_text(
+        '<xsl:stylesheet xmlns:xsl="http://www.w3.org/1999/XSL/Transform" '
+        'version="1.0"><xsl:template match="/"><out>first</out>'
+        "</xsl:template></xsl:stylesheet>"
+    )
+    register_stylesheet("custom", path)
+    compiled = xmlparser.stylesheets.get("custom")
+    assert transform_article(tryptophan, style="custom") == b"<out>first</out>"
+
+    path.write_text(
+        '<xsl:stylesheet xmlns:xsl="http://www.w3.org/1999/XSL/Transform" '
+        'version="1.0"><xsl:template match="/"><out>second</out>'
+        "</xsl:template></xsl:stylesheet>"
+    )
+    os.utime(path, ns=(0, path.stat().st_mtime_ns + 1_000_000_000))
+    assert xmlparser.stylesheets.get("custom") is not compiled
+    assert (
+        transform_article(tryptophan, style="custom") == b"<out>second</out>"
+    )
+
+
+def test_stream_chunks_matches_get_chunks(article):
+    tree = fromstring(article).getroottree()
+
+    for minlen, maxlen in ((4000, 6000), (300, 600), (50, 100)):
+        expected = list(get_chunks(tree, minlen=minlen, maxlen=maxlen))
+        assert len(expected) > 1
+        assert (
+            list(stream_chunks(BytesIO(article), minlen=minlen, maxlen=maxlen))
+            == expected
+        )
+
+
+def test_chunks_without_pretty_printing(article):
+    tree = fromstring(article).getroottree()
+    pretty = list(get_chunks(tree, minlen=300, maxlen=600))
+    tree = fromstring(article).getroottree()
+    plain = list(get_chunks(tree, minlen=300, maxlen=600, pretty_print=False))
+
+    assert [chunk.pos for chunk in plain] == [c.pos for c in pretty]
+    for chunk, expected in zip(plain, pretty):
+        assert "\n  <" not in chunk.content
+        assert (
+            tostring(
+                fromstring(chunk.content),
+                pretty_print=True,
+                encoding="unicode",
+            )
+            == expected.content
+        )
+
+
+def test_chunk_batch(article):
+    chunks = list(
+        get_chunks(fromstring(article).getroottree(), minlen=300, maxlen=600)
+    )
+    assert all(isinstance(chunk, TextChunk) for chunk in chunks)
+    assert not hasattr(chunks[0], "__dict__")
+
+    batch = ChunkBatch(chunks[:1])
+    batch.extend(chunks[1:])
+    assert len(batch) == len(chunks)
+    assert list(batch) == chunks
+    assert batch[-1] == chunks[-1]
+    assert bytes(batch.data) == "".join(c.content for c in chunks).encode()
+    assert batch.offsets[-1] == len(batch.data)
+
+
+def test_chunk_batch_to_numpy(article):
+    pytest.importorskip("numpy")
+    chunks = list(
+        get_chunks(fromstring(article).getroottree(), minlen=300, maxlen=600)
+    )
+    batch = ChunkBatch(chunks)
+
+    data, offsets, pos = batch.to_numpy()
+    assert data.tobytes() == bytes(batch.data)
+    assert offsets.tolist() == batch.offsets.tolist()
+    assert pos.tolist() == [c.pos for c in chunks]
+
+    # Writes through the batch show in the arrays: they are views.
+    batch.data[0] = ord("X")
+    batch.offsets[1] += 1
+    assert data[0] == ord("X")
+    assert offsets[1] == batch.offsets[1]
+    with pytest.raises(BufferError):
+        batch.append(chunks[0])
+
+
+def test_chunk_batch_to_arrow(article):
+    pytest.importorskip("pyarrow")
+    chunks = list(
+        get_chunks(fromstring(article).getroottree(), minlen=300, maxlen=600)
+    )
+    batch = ChunkBatch(chunks)
+
+    table = batch.to_arrow()
+    assert table.column("content").to_pylist() == [c.content for c in chunks]
+    assert table.column("pos").to_pylist() == [c.pos for c in chunks]
+    with pytest.raises(BufferError):
+        batch.append(chunks[0])
+
+
+def test_no_chunks_without_segments():
+    tree = fromstring("<article><body><p>Text</p></body></article>")
+    assert list(get_chunks(tree.getroottree())) == []
+
+
+def test_get_text_reads_the_front_matter():
+    tree = parse_file(os.path.join(os.path.dirname(__file__), "test.xml"))
+    description = get_text(tree)
+
+    assert description.pmid == get_pmid(tree) == 11914155
+    assert description.doi == get_doi(tree) == "10.1186/1472-6750-2-3"
+    assert description.metadata == get_metadata(tree)
+    assert description.pmcid == "PMC101390"
+    assert description.journal == "BMC Biotechnology"
+    assert description.title.startswith("Rhodococcus erythropolis ATCC 25544")
+
+
+def test_header_only_parsing(tmp_path, make_article):
+    path = os.path.join(os.path.dirname(__file__), "test.xml")
+    expected = get_text(parse_file(path))
+    assert get_text(parse_file(path, header_only=True)) == expected
+
+    compressed = tmp_path / "test.xml.gz"
+    with open(path, "rb") as source, gzip.open(compressed, "wb") as target:
+        target.write(source.read())
+    assert get_text(parse_file(compressed, header_only=True)) == expected
+    assert get_text(parse_file(compressed)) == expected
+
+    large = make_article(sections=200)
+    header = parse_file(BytesIO(large), header_only=True)
+    assert get_text(header) == get_text(parse_file(BytesIO(large)))
+    assert len(list(header.iter())) < len(
+        list(parse_file(BytesIO(large)).iter())
+    )
+
+
+def test_compressed_and_mapped_input(tmp_path, article):
+    expected = tostring(parse_file(BytesIO(article)))
+    with_hr = article.replace(b"</article>", b"<hr></article>")
+    transformed = transform_article(with_hr.decode())
+
+    for compress in (gzip.compress, bz2.compress, lzma.compress):
+        path = tmp_path / compress.__module__
+        path.write_bytes(compress(article))
+        assert tostring(parse_file(path)) == expected
+        assert tostring(parse_file(memoryview(path.read_bytes()))) == expected
+
+        path.write_bytes(compress(with_hr))
+        assert transform_article(Path(path)) == transformed
+        with open(path, "rb") as file:
+            assert transform_article(file) == transformed
+            with mmap.mmap(
+                file.fileno(), 0, access=mmap.ACCESS_READ
+            ) as mapped:
+                assert transform_article(mapped) == transformed
+
+
+def test_parse_errors_name_the_source(tmp_path, capsys):
+    broken = b"<article>" + b"x" * 200
+    path = tmp_path / "broken.xml"
+    path.write_bytes(broken)
+
+    for source, name in (
+        (broken, "<bytes>"),
+        (memoryview(broken), "<memoryview>"),
+        (BytesIO(broken), "<BytesIO>"),
+        (path, str(path)),
+    ):
+        with pytest.raises(XMLSyntaxError):
+            parse_file(source)
+        assert capsys.readouterr().out == f"{name} could not be parsed\n"
+
+
+def test_hr_tags_are_closed_across_reads():
+    xml = b"<td><hr></td>" * 10
+
+    for size in range(1, 8):
+        stream = ClosingReader(BytesIO(xml), size=size)
+        assert stream.read() == close_tags(xml) == b"<td><hr/></td>" * 10
+
+
+def test_parse_tar_members(tmp_path):
+    path = os.path.join(os.path.dirname(__file__), "test.xml")
+    archive = tmp_path / "articles.tar.gz"
+    with tarfile.open(archive, "w:gz") as tar:
+        tar.add(path, arcname="PMC101390/test.nxml")
+
+    members = [
+        (name, get_text(parse_file(stream, header_only=True)).pmid)
+        for name, stream in tar_members(archive)
+    ]
+    assert members == [("PMC101390/test.nxml", 11914155)]